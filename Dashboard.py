@@ -4,117 +4,92 @@ import os
 import time
 import altair as alt
 from datetime import datetime
-import urllib.parse
+from storage import VOTER_TYPE_COL, UNKNOWN_VOTER_TYPE, FILE_NAME, STORAGE_BACKEND, open_default_storage
+from ingest import GroupCommitWriter
+from aggregates import AggregateIndex, STATUS_LABELS, status_of
+from qrcodes import DEFAULT_BASE_URL, voting_link, qr_png
+from export import export_csv, export_parquet
+from leaderboard import project_leaderboard
+from rubric import RUBRIC, RUBRIC_CONTENT, RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION, get_rubric_columns, weighted_total
+import perf
 
 # --- 1. 頁面設定 ---
 st.set_page_config(page_title="新光醫院 AI 軟體評定", layout="wide")
 
-# --- 2. 完整 16 條評核指標內容與權重定義 (總分 100) ---
-RUBRIC_CONTENT = {
-    "1. 模型準確度與臨床一致性": "評核 AUC/感度/特異性是否達標。方式：查驗臨床驗證報告與 TFDA 許可證。",
-    "2. 異常值偵測與風險警示": "辨識無法判讀影像之能力。方式：測試高風險病灶之即時通報機制。",
-    "3. 病患安全防護機制": "防止過度診斷。方式：確認具備『醫師覆核』流程，而非 AI 自動發報。",
-    "4. 臨床工作流適應性": "是否符合現有診斷流程。方式：評估醫師操作步驟是否增加負擔或能簡化流程。",
-    "5. 院內系統整合度": "支援 DICOM/HL7 指標。方式：觀察與 PACS/HIS 介接流暢度 (建議 < 5秒)。",
-    "6. 資安合規性": "數據傳輸加密。方式：查驗 ISO 27001 認證或資安漏洞掃描報告。",
-    "7. 系統維運與更新機制": "系統穩定性。方式：確認當機備援方案 (DR) 及廠商 SLA 支援能力。",
-    "8. 數據隱私與去識別化": "保護病患隱私。方式：查驗資料產出、傳輸及儲存是否落實去識別化規範。",
-    "9. 可解釋性與透明度": "非黑箱 AI。方式：確認是否提供 Heatmap (熱區圖) 或信心度評分。",
-    "10. 人類監督機制": "醫師最高權限。方式：測試醫師是否能更正結果並保留修改軌跡。",
-    "11. 偏差檢測與公平性": "避免演算法歧視。方式：查驗模型在不同性別、年齡層之效能是否穩定無顯著偏差。",
-    "12. 模型生命週期管理": "效能不隨時間下降。方式：確認廠商有無監控效能偏移 (Drift) 機制。",
-    "13. 成本效益分析": "ROI 評估。方式：評估是否縮短判讀時程 (TAT) 或降低檢查支出。",
-    "14. 市場實績與品牌信譽": "產品成熟度。方式：查驗國內外醫學中心採用實績及廠商財務/技術服務穩定度。",
-    "15. 病患體驗與衛教應用": "醫病溝通。方式：查驗 AI 報告是否具備圖形化輸出供病患參考。",
-    "16. ESG 與永續指標": "社會責任。方式：評估無紙化程度及對偏鄉醫療可近性之提升。"
-}
-
-RUBRIC = {
-    "一、臨床卓越與安全性 (35%)": [
-        ("1. 模型準確度與臨床一致性", 10.0), ("2. 異常值偵測與風險警示", 9.0), 
-        ("3. 病患安全防護機制", 8.0), ("4. 臨床工作流適應性", 8.0)
-    ],
-    "二、系統整合與資安 (25%)": [
-        ("5. 院內系統整合度", 7.0), ("6. 資安合規性", 7.0), 
-        ("7. 系統維運與更新機制", 6.0), ("8. 數據隱私與去識別化", 5.0)
-    ],
-    "三、負責性 AI 與治理 (25%)": [
-        ("9. 可解釋性與透明度", 7.0), ("10. 人類監督機制", 7.0), 
-        ("11. 偏差檢測與公平性", 5.0), ("12. 模型生命週期管理", 6.0)
-    ],
-    "四、營運效益與創新價值 (15%)": [
-        ("13. 成本效益分析", 5.0), ("14. 市場實績與品牌信譽", 4.0),
-        ("15. 病患體驗與衛教應用", 3.0), ("16. ESG 與永續指標", 3.0)
-    ]
-}
-
-FILE_NAME = "vote_data_v2.csv"
-VOTER_TYPE_COL = "Voter Type"
+# --- 2. 16 條評核指標與權重 (RUBRIC，含各版本) 定義於 rubric.py ---
+
 VOTER_TYPES = ["院內", "院外"]
-UNKNOWN_VOTER_TYPE = "未分類"
 
-def get_rubric_columns():
-    cols = []
-    for cat in RUBRIC:
-        for name, weight in RUBRIC[cat]:
-            cols.append(name)
-    return cols
+# 儲存後端 (csv / sqlite) 與資料檔位置由 storage.py 依 VOTE_STORAGE / VOTE_DB 決定
+
+# 手機評分網址的前綴，本機或院內部署時改成自己的網址 (例如 http://10.0.0.5:8501)；
+# 指向 vote_api.py (例如 http://10.0.0.5:8502) 時，手機改用不占 Streamlit session 的輕量表單
+VOTE_BASE_URL = os.environ.get("VOTE_BASE_URL", DEFAULT_BASE_URL)
+
+# Live 模式檢查資料版本的最短間隔 (秒)；版本沒變時看板不重建任何內容
+LIVE_REFRESH_SECONDS = float(os.environ.get("LIVE_REFRESH_SECONDS", "1"))
+
+# 看板檢視模式；排行榜圖表只畫前 N 名 (表格仍列出全部專案)
+PROJECT_VIEW, LEADERBOARD_VIEW = "🎯 單一專案", "🏆 跨專案排行榜"
+LEADERBOARD_CHART_TOP = 40
 
-def get_csv_columns():
-    return ["Project", "Voter", VOTER_TYPE_COL, "Timestamp", "Total Score", "Feedback"] + get_rubric_columns()
+# 決策結論的顏色，順序對應 STATUS_LABELS
+STATUS_COLORS = ["#28a745", "#ffc107", "#dc3545"]
 
 def append_record(record):
-    ensure_csv()
-    cols = pd.read_csv(FILE_NAME, nrows=0).columns.tolist()
-    pd.DataFrame([record]).reindex(columns=cols).to_csv(FILE_NAME, mode='a', index=False, header=False)
+    """ 經由 group commit 佇列寫入一筆紀錄，回傳提交延遲 (秒) """
+    with perf.timed("append_record"):
+        return get_writer().submit(record)
 
 # --- 3. 核心輔助函式 ---
-def ensure_csv():
-    """ 確保 CSV 檔案存在且具備正確欄位 """
-    expected_cols = get_csv_columns()
-    if not os.path.exists(FILE_NAME):
-        pd.DataFrame(columns=expected_cols).to_csv(FILE_NAME, index=False)
-        return
+@st.cache_resource
+def get_storage():
+    """ 跨 session 共用的儲存後端 (CSV 後端內含增量讀取快取) """
+    return open_default_storage()
+
+@st.cache_resource
+def get_writer():
+    """ 全行程共用一個寫入佇列，同時湧入的選票合併成一次上鎖寫入 """
+    return GroupCommitWriter(get_storage())
+
+@st.cache_resource
+def get_aggregates():
+    """ 各專案的即時統計 (每位評審最後一張選票)，隨新選票增量更新 """
+    return AggregateIndex(get_rubric_columns())
+
+@st.cache_resource
+def get_history_cache():
+    """ 全行程共用的專案歷史紀錄：{專案: (資料版本, 依時間倒序的 DataFrame)}，每個專案只留最新版本一份 """
+    return {}
+
+def project_history(storage, curr, version):
+    """ 專案完整投票紀錄；同一個資料版本只讀一次，所有 session 共用 (呼叫端請勿就地修改) """
+    cache = get_history_cache()
+    hit = cache.get(curr)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    with perf.timed("history.load") as t:
+        df = storage.load_project(curr).sort_values("Timestamp", ascending=False)
+        t["rows"] = len(df)
+    cache[curr] = (version, df)
+    return df
 
-    df = pd.read_csv(FILE_NAME)
-    changed = False
-    if VOTER_TYPE_COL not in df.columns:
-        df[VOTER_TYPE_COL] = UNKNOWN_VOTER_TYPE
-        changed = True
-    for col in expected_cols:
-        if col not in df.columns:
-            df[col] = ""
-            changed = True
-    extra_cols = [col for col in df.columns if col not in expected_cols]
-    ordered_cols = expected_cols + extra_cols
-    if df.columns.tolist() != ordered_cols:
-        df = df.reindex(columns=ordered_cols)
-        changed = True
-    if changed:
-        df[VOTER_TYPE_COL] = df[VOTER_TYPE_COL].fillna(UNKNOWN_VOTER_TYPE).replace("", UNKNOWN_VOTER_TYPE)
-        df.to_csv(FILE_NAME, index=False)
+def ensure_csv():
+    """ 確保資料檔存在且具備正確欄位 """
+    with perf.timed("ensure_csv"):
+        get_storage().ensure_schema()
 
 def get_existing_projects():
     """ 取得所有已建立的專案名稱 """
     ensure_csv()
     try:
-        df = pd.read_csv(FILE_NAME)
-        return sorted([str(p) for p in df["Project"].dropna().unique().tolist() if str(p) != "SYSTEM_INIT"])
+        return get_storage().projects()
     except: return []
 
 def get_project_type(project_name):
     ensure_csv()
     try:
-        df = pd.read_csv(FILE_NAME)
-        if VOTER_TYPE_COL not in df.columns:
-            return UNKNOWN_VOTER_TYPE
-        project_rows = df[df["Project"] == project_name]
-        init_rows = project_rows[project_rows["Voter"] == "SYSTEM_INIT"]
-        source = init_rows if not init_rows.empty else project_rows
-        values = source[VOTER_TYPE_COL].dropna().astype(str).replace("", UNKNOWN_VOTER_TYPE)
-        if values.empty:
-            return UNKNOWN_VOTER_TYPE
-        return values.iloc[0]
+        return get_storage().project_type(project_name)
     except Exception:
         return UNKNOWN_VOTER_TYPE
 
@@ -137,15 +112,13 @@ def render_voting_page():
     project_type = get_project_type(project_name)
     st.caption(f"專案類別：{project_type}")
 
+    # 選票存原始分數 (0~100) 與評分版本，總分由 rubric.py 依版本權重計算
     user_scores = {}
-    total = 0
     for cat, items in RUBRIC.items():
         st.subheader(cat)
         for name, weight in items:
-            score = st.slider(name, 0, 100, 70, 5, help=RUBRIC_CONTENT.get(name), key=f"vote_{name}")
-            w_score = (score / 100) * weight
-            user_scores[name] = w_score
-            total += w_score
+            user_scores[name] = st.slider(name, 0, 100, 70, 5, help=RUBRIC_CONTENT.get(name), key=f"vote_{name}")
+    total = weighted_total(user_scores)
 
     st.divider()
     c = "green" if total >= 75 else "orange" if total >= 60 else "red"
@@ -157,14 +130,182 @@ def render_voting_page():
         if not voter_name: 
             st.error("❌ 請輸入姓名以供系統核對。")
         else:
-            ensure_csv()
-            rec = {"Project": project_name, "Voter": voter_name, VOTER_TYPE_COL: project_type, "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Total Score": total, "Feedback": fb}
+            rec = {"Project": project_name, "Voter": voter_name, VOTER_TYPE_COL: project_type, "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Total Score": total, "Feedback": fb, RUBRIC_VERSION_COL: CURRENT_RUBRIC_VERSION}
             rec.update(user_scores)
-            append_record(rec)
-            st.success("✅ 提交成功！感謝您的評分。")
-            st.balloons()
-            time.sleep(1)
-            st.rerun()
+            try:
+                latency = append_record(rec)
+            except TimeoutError as e:
+                st.error(f"❌ {e}，請稍後確認看板後再決定是否重新提交。")
+            else:
+                st.success("✅ 提交成功！感謝您的評分。")
+                st.caption(f"寫入耗時 {latency * 1000:.0f} ms")
+                st.balloons()
+                time.sleep(1)
+                st.rerun()
+
+def build_status_pie(summary):
+    st_counts = pd.DataFrame([{"類別": k, "票數": v} for k, v in summary["status"].items() if v > 0]).sort_values("票數", ascending=False)
+    return alt.Chart(st_counts).mark_arc(outerRadius=120).encode(
+        theta="票數", 
+        color=alt.Color("類別", scale=alt.Scale(domain=STATUS_LABELS, range=STATUS_COLORS), legend=alt.Legend(labelFontSize=18))
+    ).properties(height=450)
+
+def build_criteria_bar(summary):
+    items = []
+    for cat, crits in RUBRIC.items():
+        for n, w in crits:
+            v = summary["criteria"].get(n, 0)
+            items.append({"項": n, "率": round(v, 1), "類": cat.split(" ")[0]})
+    bar = alt.Chart(pd.DataFrame(items)).mark_bar().encode(
+        x=alt.X("率", scale=alt.Scale(domain=[0, 100])), 
+        y=alt.Y("項", sort=None, axis=alt.Axis(labelLimit=400, labelFontSize=16)), 
+        color="類"
+    ).properties(height=500)
+    return bar + bar.mark_text(align='left', dx=5, fontSize=16, fontWeight='bold').encode(text='率:Q')
+
+def build_leaderboard_bar(board):
+    top = board.head(LEADERBOARD_CHART_TOP).assign(專案=lambda d: d["專案"].astype(str))
+    bar = alt.Chart(top).mark_bar().encode(
+        x=alt.X("平均總分", scale=alt.Scale(domain=[0, 100])),
+        y=alt.Y("專案", sort=None, axis=alt.Axis(labelLimit=400, labelFontSize=16)),
+        color=alt.Color("決策結論", scale=alt.Scale(domain=STATUS_LABELS, range=STATUS_COLORS))
+    ).properties(height=max(300, 30 * len(top)))
+    return bar + bar.mark_text(align='left', dx=5, fontSize=16, fontWeight='bold').encode(text=alt.Text('平均總分:Q', format=".1f"))
+
+def render_leaderboard():
+    """ 跨專案排行榜；資料版本沒變時沿用上次的排名與圖表 """
+    with perf.run_scope("leaderboard"):
+        storage = get_storage()
+        if not storage.exists():
+            st.warning("⚠️ 目前尚未有任何專案的投票資料。")
+            return
+        with perf.timed("version_check"):
+            version = storage.version()
+        memo = st.session_state.setdefault("board_memo", {})
+        if memo.get("key") != version:
+            board = project_leaderboard(storage)
+            memo.update(key=version, board=board.round(1), chart=build_leaderboard_bar(board) if not board.empty else None)
+        if memo["chart"] is None:
+            st.warning("⚠️ 目前尚未有任何專案的投票資料。")
+            return
+        st.markdown(f"### 共 {len(memo['board'])} 個專案 (依平均總分排序)")
+        st.altair_chart(memo["chart"], use_container_width=True)
+        st.dataframe(memo["board"], use_container_width=True, hide_index=True)
+
+def render_live_data(curr):
+    """ 看板上與投票資料有關的區塊；資料版本沒變時沿用上次整理好的統計與圖表 """
+    with perf.run_scope("live_data", project=curr):
+        _render_live_data(curr)
+
+def _render_live_data(curr):
+    storage = get_storage()
+    if storage.exists():
+        with perf.timed("version_check"):
+            version = storage.version()
+        memo = st.session_state.setdefault("live_memo", {})
+        if memo.get("key") != (curr, version):
+            memo.clear()
+            memo["key"] = (curr, version)
+            with perf.timed("aggregate.sync"):
+                aggregates = get_aggregates().sync(storage)
+            with perf.timed("aggregate.view") as t:
+                memo["view"] = aggregates.project_view(curr)
+                t["ballots"] = memo["view"]["all"]["count"] if memo["view"] else 0
+            if perf.is_enabled() and STORAGE_BACKEND == "csv":
+                perf.gauge("file_bytes", os.path.getsize(FILE_NAME))
+        view = memo["view"]
+        
+        if view is not None:
+            group_options = ["全部"] + [t for t in VOTER_TYPES if t in view["voter_types"]]
+            if UNKNOWN_VOTER_TYPE in view["voter_types"]:
+                group_options.append(UNKNOWN_VOTER_TYPE)
+            selected_group = st.radio("統計範圍", group_options, horizontal=True)
+            summary = view["all"] if selected_group == "全部" else view["groups"].get(selected_group)
+
+            if not summary or summary["count"] == 0:
+                st.warning(f"目前沒有「{selected_group}」的投票資料。")
+                return
+
+            avg = summary["avg"]
+            res = status_of(avg)
+            clr = STATUS_COLORS[STATUS_LABELS.index(res)]
+
+            # 1. 頂部大數據 (變色連動)
+            m1, m2, m3 = st.columns(3)
+            def box(l, v): return f"<div style='text-align:center;'><p style='font-size:28px; color:#555;'>{l}</p><p style='font-size:85px; font-weight:bold; color:{clr}; margin-top:-20px;'>{v}</p></div>"
+            m1.markdown(box("已投人數", summary["count"]), unsafe_allow_html=True)
+            m2.markdown(box("平均總分", f"{avg:.1f}"), unsafe_allow_html=True)
+            m3.markdown(box("決策結論", res), unsafe_allow_html=True)
+
+            group_summary = pd.DataFrame(
+                [{VOTER_TYPE_COL: t, "投票人數": g["count"], "平均分數": round(g["avg"], 1)} for t, g in sorted(view["groups"].items())]
+            )
+            st.markdown("### 院內／院外統計")
+            st.dataframe(group_summary, use_container_width=True, hide_index=True)
+
+            st.divider()
+            
+            # 2. 圖表區域 (同一資料版本只建一次圖表)
+            charts = memo.get(selected_group)
+            if charts is None:
+                with perf.timed("chart.pie"):
+                    pie = build_status_pie(summary)
+                with perf.timed("chart.bar"):
+                    bar = build_criteria_bar(summary)
+                charts = memo[selected_group] = (pie, bar)
+            pie, bar = charts
+            c_left, c_right = st.columns([2, 3])
+            with c_left:
+                st.markdown("### 🗳️ 投票分佈")
+                st.altair_chart(pie, use_container_width=True)
+
+            with c_right:
+                st.markdown("### 📈 指標達成率 (%)")
+                st.altair_chart(bar, use_container_width=True)
+
+            # 3. 匿名意見 (大字體)
+            st.divider()
+            st.markdown("<h2 style='color: #4B0082;'>💬 評審匿名建議回饋</h2>", unsafe_allow_html=True)
+            fb_list = summary["feedback"]
+            if fb_list:
+                for i, msg in enumerate(fb_list, 1):
+                    st.markdown(f"""<div style="background-color:#f0f2f6;padding:25px;border-radius:10px;margin-bottom:15px;border-left:10px solid #4B0082;"><span style="font-size:30px;font-weight:500;">{msg}</span></div>""", unsafe_allow_html=True)
+            else: st.caption("尚未有意見回饋。")
+
+            # 4. 投票歷程與 Log
+            st.divider()
+            with st.expander("🕒 完整投票紀錄與 Log", expanded=False):
+                # 依 (專案, 資料版本) 全行程快取：資料沒變時不重讀歷史紀錄
+                st.dataframe(project_history(storage, curr, version), use_container_width=True)
+                # 下載檔只在按下時才分段產生，並依 (專案, 資料版本) 快取
+                st.download_button("📥 下載完整數據 CSV", lambda: export_csv(storage, curr), f'{curr}_history.csv', mime="text/csv", on_click="ignore")
+        else:
+            st.warning("⚠️ 該專案目前尚未有正式數據，請由手機端開始評分。")
+
+def watch_version(seen):
+    """ Live 模式的輕量輪詢：只比對資料版本 (一次 stat)，有新資料才整頁重跑；版本沒變時不送出任何元件 """
+    with perf.timed("version_check"):
+        version = get_storage().version()
+    if version != seen:
+        st.rerun()
+
+def render_diagnostics():
+    """ 各量測點最近的 p50/p95/max、資料量與投票寫入延遲；量測要在面板中手動開啟，用完請關閉 """
+    with st.expander("🩺 效能診斷", expanded=True):
+        # 量測開關為整個服務共用 (每次刷新都會多寫一行 JSON 到 stderr)，每次顯示前先對齊目前的實際設定
+        st.session_state["perf_toggle"] = perf.is_enabled()
+        enabled = st.toggle("啟用量測 (所有 session 共用)", key="perf_toggle",
+                            on_change=lambda: perf.enable(st.session_state["perf_toggle"]))
+        rows, gauges = perf.snapshot()
+        if rows:
+            st.dataframe(pd.DataFrame(rows).round(2), hide_index=True, use_container_width=True)
+        elif enabled:
+            st.caption("量測已啟用，下一次刷新後顯示數據。")
+        else:
+            st.caption("量測目前關閉。")
+        st.json({**gauges, "ingest": get_writer().stats()})
+        if st.button("重設統計"):
+            perf.reset()
 
 # --- 頁面渲染：決策看板端 (大螢幕) ---
 def render_dashboard_page():
@@ -174,12 +315,12 @@ def render_dashboard_page():
     # --- 側邊欄專案管理 ---
     with st.sidebar:
         st.header("🗂️ 專案管理")
+        view_mode = st.radio("檢視模式", [PROJECT_VIEW, LEADERBOARD_VIEW], horizontal=True)
         with st.form("new_proj", clear_on_submit=True):
             name = st.text_input("➕ 新增專案名稱")
             project_type = st.selectbox("專案類別", VOTER_TYPES)
             if st.form_submit_button("建立"):
                 if name:
-                    ensure_csv()
                     dummy = {"Project": name, "Voter": "SYSTEM_INIT", VOTER_TYPE_COL: project_type, "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Total Score": 0}
                     append_record(dummy)
                     st.session_state["current_project"] = name
@@ -193,16 +334,38 @@ def render_dashboard_page():
             st.session_state["current_project"] = sel
         
         auto = st.toggle("🔄 自動刷新 (Live)", value=True)
+        refresh_interval = LIVE_REFRESH_SECONDS
+        if auto:
+            refresh_interval = st.number_input("檢查新選票間隔 (秒)", min_value=0.5, max_value=60.0, value=LIVE_REFRESH_SECONDS, step=0.5)
         
+        # 全部專案匯出 (CSV / Parquet)，按下下載時才從儲存後端分段產生
+        st.divider()
+        with st.popover("📦 匯出全部專案數據", use_container_width=True):
+            st.download_button("📥 CSV", lambda: export_csv(get_storage()), "vote_data_all.csv", mime="text/csv", on_click="ignore", use_container_width=True)
+            st.download_button("📥 Parquet", lambda: export_parquet(get_storage()), "vote_data_all.parquet", mime="application/vnd.apache.parquet", on_click="ignore", use_container_width=True)
+
         # ✅ 清除資料確認機制 (使用 Popover)
         st.divider()
         with st.popover("🗑️ 清空所有數據", use_container_width=True):
             st.error("確定要清空所有專案與歷史評分嗎？此動作不可撤銷。")
             if st.button("🔴 確定刪除，不後悔", type="primary", use_container_width=True):
-                if os.path.exists(FILE_NAME): os.remove(FILE_NAME)
+                get_storage().clear()
                 st.session_state.clear()
                 st.rerun()
 
+        # 隱藏的效能診斷面板：網址加上 ?diag=1 才會出現，量測需在面板內開啟
+        if st.query_params.get("diag") == "1":
+            render_diagnostics()
+
+    # 跨專案排行榜：同樣只有資料區塊會定期重跑
+    if view_mode == LEADERBOARD_VIEW:
+        st.markdown("<h1 style='text-align: center;'>🏆 跨專案排行榜</h1>", unsafe_allow_html=True)
+        seen = get_storage().version()
+        render_leaderboard()
+        if auto:
+            st.fragment(watch_version, run_every=refresh_interval)(seen)
+        return
+
     curr = st.session_state["current_project"]
     if not curr: 
         st.info("👋 您好，請在左側新增或切換專案，開始進行 AI 評核。")
@@ -212,102 +375,20 @@ def render_dashboard_page():
     st.markdown(f"<h1 style='text-align: center;'>📊 {curr} - 決策看板</h1>", unsafe_allow_html=True)
     
     # QR Code 與 加大連結
-    link = f"https://shinkong-ai-vote.streamlit.app/?page=vote&project={urllib.parse.quote(curr)}"
+    link = voting_link(VOTE_BASE_URL, curr)
     col_l, col_r = st.columns([1, 4])
     with col_l:
-        st.image(f"https://api.qrserver.com/v1/create-qr-code/?size=150x150&data={urllib.parse.quote(link)}")
+        st.image(qr_png(curr, VOTE_BASE_URL, 150), width=150)
     with col_r:
         st.markdown(f"<div style='background-color:#f0f2f6; padding:15px; border-radius:10px;'><strong>手機評分網址：</strong><br><a href='{link}' style='font-size:24px; color:#1E90FF; word-break:break-all;'>{link}</a></div>", unsafe_allow_html=True)
 
     st.divider()
 
-    # 數據呈現區
-    if os.path.exists(FILE_NAME):
-        df_all = pd.read_csv(FILE_NAME)
-        df_p = df_all[(df_all["Project"] == curr) & (df_all["Voter"] != "SYSTEM_INIT")]
-        
-        if not df_p.empty:
-            df_p = df_p.copy()
-            if VOTER_TYPE_COL not in df_p.columns:
-                df_p[VOTER_TYPE_COL] = UNKNOWN_VOTER_TYPE
-            df_p[VOTER_TYPE_COL] = df_p[VOTER_TYPE_COL].fillna(UNKNOWN_VOTER_TYPE).replace("", UNKNOWN_VOTER_TYPE)
-
-            group_options = ["全部"] + [t for t in VOTER_TYPES if t in df_p[VOTER_TYPE_COL].unique().tolist()]
-            if UNKNOWN_VOTER_TYPE in df_p[VOTER_TYPE_COL].unique().tolist():
-                group_options.append(UNKNOWN_VOTER_TYPE)
-            selected_group = st.radio("統計範圍", group_options, horizontal=True)
-            df_view = df_p if selected_group == "全部" else df_p[df_p[VOTER_TYPE_COL] == selected_group]
-
-            if df_view.empty:
-                st.warning(f"目前沒有「{selected_group}」的投票資料。")
-                return
-
-            df_c = df_view.sort_values("Timestamp").drop_duplicates(subset=["Voter", VOTER_TYPE_COL], keep="last")
-            avg = df_c["Total Score"].mean()
-            res = "推薦引進" if avg >= 75 else "修正後推薦" if avg >= 60 else "不推薦"
-            clr = "#28a745" if avg >= 75 else "#ffc107" if avg >= 60 else "#dc3545"
-
-            # 1. 頂部大數據 (變色連動)
-            m1, m2, m3 = st.columns(3)
-            def box(l, v): return f"<div style='text-align:center;'><p style='font-size:28px; color:#555;'>{l}</p><p style='font-size:85px; font-weight:bold; color:{clr}; margin-top:-20px;'>{v}</p></div>"
-            m1.markdown(box("已投人數", len(df_c)), unsafe_allow_html=True)
-            m2.markdown(box("平均總分", f"{avg:.1f}"), unsafe_allow_html=True)
-            m3.markdown(box("決策結論", res), unsafe_allow_html=True)
-
-            group_base = df_p.sort_values("Timestamp").drop_duplicates(subset=["Voter", VOTER_TYPE_COL], keep="last")
-            group_summary = group_base.groupby(VOTER_TYPE_COL, as_index=False).agg(
-                投票人數=("Voter", "count"),
-                平均分數=("Total Score", "mean"),
-            )
-            group_summary["平均分數"] = group_summary["平均分數"].round(1)
-            st.markdown("### 院內／院外統計")
-            st.dataframe(group_summary, use_container_width=True, hide_index=True)
-
-            st.divider()
-            
-            # 2. 圖表區域
-            c_left, c_right = st.columns([2, 3])
-            with c_left:
-                st.markdown("### 🗳️ 投票分佈")
-                df_c["Status"] = df_c["Total Score"].apply(lambda s: "推薦引進" if s >= 75 else "修正後推薦" if s >= 60 else "不推薦")
-                st_counts = df_c["Status"].value_counts().reset_index()
-                st_counts.columns = ["類別", "票數"]
-                pie = alt.Chart(st_counts).mark_arc(outerRadius=120).encode(
-                    theta="票數", 
-                    color=alt.Color("類別", scale=alt.Scale(domain=["推薦引進", "修正後推薦", "不推薦"], range=["#28a745", "#ffc107", "#dc3545"]), legend=alt.Legend(labelFontSize=18))
-                ).properties(height=450)
-                st.altair_chart(pie, use_container_width=True)
-
-            with c_right:
-                st.markdown("### 📈 指標達成率 (%)")
-                items = []
-                for cat, crits in RUBRIC.items():
-                    for n, w in crits:
-                        v = df_c[n].mean() if n in df_c.columns else 0
-                        items.append({"項": n, "率": round((v/w)*100, 1), "類": cat.split(" ")[0]})
-                bar = alt.Chart(pd.DataFrame(items)).mark_bar().encode(
-                    x=alt.X("率", scale=alt.Scale(domain=[0, 100])), 
-                    y=alt.Y("項", sort=None, axis=alt.Axis(labelLimit=400, labelFontSize=16)), 
-                    color="類"
-                ).properties(height=500)
-                st.altair_chart(bar + bar.mark_text(align='left', dx=5, fontSize=16, fontWeight='bold').encode(text='率:Q'), use_container_width=True)
-
-            # 3. 匿名意見 (大字體)
-            st.divider()
-            st.markdown("<h2 style='color: #4B0082;'>💬 評審匿名建議回饋</h2>", unsafe_allow_html=True)
-            fb_list = df_c[df_c["Feedback"].notna() & (df_c["Feedback"] != "")]["Feedback"].tolist()
-            if fb_list:
-                for i, msg in enumerate(fb_list, 1):
-                    st.markdown(f"""<div style="background-color:#f0f2f6;padding:25px;border-radius:10px;margin-bottom:15px;border-left:10px solid #4B0082;"><span style="font-size:30px;font-weight:500;">{msg}</span></div>""", unsafe_allow_html=True)
-            else: st.caption("尚未有意見回饋。")
-
-            # 4. 投票歷程與 Log
-            st.divider()
-            with st.expander("🕒 完整投票紀錄與 Log", expanded=False):
-                st.dataframe(df_p.sort_values("Timestamp", ascending=False), use_container_width=True)
-                st.download_button("📥 下載完整數據 CSV", df_p.to_csv(index=False).encode('utf-8-sig'), f'{curr}_history.csv')
-        else:
-            st.warning("⚠️ 該專案目前尚未有正式數據，請由手機端開始評分。")
+    # 數據呈現區：Live 模式下只有版本輪詢會定期執行，資料有變動時才整頁重跑
+    seen = get_storage().version()
+    render_live_data(curr)
+    if auto:
+        st.fragment(watch_version, run_every=refresh_interval)(seen)
 
     # 5. 指標評核準則 (全域顯示一次)
     st.divider()
@@ -322,9 +403,8 @@ def render_dashboard_page():
             col.markdown(f'<div style="background-color:#f8f9fa;padding:15px;border-radius:8px;margin-bottom:10px;border-left:5px solid #1E90FF;"><span style="font-size:20px;font-weight:bold;color:#333;">{n} <span style="color:#ff4b4b;">({w}分)</span></span><br><span style="font-size:18px;color:#666;">{c}</span></div>', unsafe_allow_html=True)
     show_g(full_guide[:8], gl); show_g(full_guide[8:], gr)
 
-    if auto: time.sleep(5); st.rerun()
-
 # --- 5. 路由路由 ---
 page = st.query_params.get("page", "dashboard")
-if page == "vote": render_voting_page()
-else: render_dashboard_page()
+with perf.run_scope(page):
+    if page == "vote": render_voting_page()
+    else: render_dashboard_page()
@@ -0,0 +1,165 @@
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from rubric import CURRENT_RUBRIC_VERSION, raw_matrix, score
+from storage import VOTER_TYPE_COL, UNKNOWN_VOTER_TYPE, SYSTEM_VOTER, apply_dtypes, is_blank
+
+# 決策結論：總分 ≥ STATUS_THRESHOLDS[i] 為 STATUS_LABELS[i]，都未達者為最後一項；看板與排行榜共用
+STATUS_LABELS = ["推薦引進", "修正後推薦", "不推薦"]
+STATUS_THRESHOLDS = [75, 60]
+
+# timestamp 為排序用的整數時間 (微秒)，total 為依目前評分版本重新計算的總分，scores 為各指標 0~100 原始分數
+Ballot = namedtuple("Ballot", ["timestamp", "total", "scores", "feedback"])
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+
+def status_of(score):
+    """ 依總分判定決策結論 (≥75 推薦引進、≥60 修正後推薦、其餘不推薦) """
+    for label, threshold in zip(STATUS_LABELS, STATUS_THRESHOLDS):
+        if score >= threshold:
+            return label
+    return STATUS_LABELS[-1]
+
+
+def _mean(total, count):
+    return total / count if count else float("nan")
+
+
+class GroupAggregate:
+    """ 單一專案、單一評審類別的累計值：人數、總分與各指標原始分數的加總/筆數、決策分佈 """
+
+    def __init__(self, n_criteria):
+        self.count = 0
+        self.total_sum = 0.0
+        self.total_count = 0
+        self.crit_sums = [0.0] * n_criteria
+        self.crit_counts = [0] * n_criteria
+        self.status = dict.fromkeys(STATUS_LABELS, 0)
+
+    def add(self, ballot, sign=1):
+        """ sign=1 計入一張選票，sign=-1 撤回 (評審重新提交時使用) """
+        self.count += sign
+        self.status[status_of(ballot.total)] += sign
+        if not math.isnan(ballot.total):
+            self.total_sum += sign * ballot.total
+            self.total_count += sign
+        for i, value in enumerate(ballot.scores):
+            if not math.isnan(value):
+                self.crit_sums[i] += sign * value
+                self.crit_counts[i] += sign
+
+    def merge(self, other):
+        self.count += other.count
+        self.total_sum += other.total_sum
+        self.total_count += other.total_count
+        for i in range(len(self.crit_sums)):
+            self.crit_sums[i] += other.crit_sums[i]
+            self.crit_counts[i] += other.crit_counts[i]
+        for label in STATUS_LABELS:
+            self.status[label] += other.status[label]
+
+
+class ProjectAggregate:
+    """ 單一專案：每位評審 (姓名 + 類別) 最後一張選票，以及依評審類別分組的累計值 """
+
+    def __init__(self, n_criteria):
+        self.n_criteria = n_criteria
+        self.latest = {}
+        self.groups = {}
+
+    def apply(self, voter, voter_type, ballot):
+        key = (voter, voter_type)
+        old = self.latest.get(key)
+        if old is not None and ballot.timestamp < old.timestamp:
+            return
+        group = self.groups.get(voter_type)
+        if group is None:
+            group = self.groups[voter_type] = GroupAggregate(self.n_criteria)
+        if old is not None:
+            group.add(old, -1)
+        group.add(ballot)
+        self.latest[key] = ballot
+
+    def summary(self, criteria, voter_type=None):
+        """ 整理成看板需要的數字 (criteria 為各指標達成率 %)；voter_type 為 None 代表全部評審 """
+        if voter_type is None:
+            group = GroupAggregate(self.n_criteria)
+            for g in self.groups.values():
+                group.merge(g)
+        else:
+            group = self.groups.get(voter_type) or GroupAggregate(self.n_criteria)
+        ballots = sorted(
+            (b for (_, t), b in self.latest.items() if voter_type is None or t == voter_type),
+            key=lambda b: b.timestamp,
+        )
+        return {
+            "count": group.count,
+            "avg": _mean(group.total_sum, group.total_count),
+            "status": dict(group.status),
+            "criteria": {name: _mean(group.crit_sums[i], group.crit_counts[i]) for i, name in enumerate(criteria)},
+            "feedback": [b.feedback for b in ballots if not is_blank(b.feedback)],
+        }
+
+
+class AggregateIndex:
+    """ 所有專案的即時統計：從儲存後端的增量變更更新，每張新選票 O(1)，看板不必重讀歷史資料 """
+
+    def __init__(self, criteria, rubric_version=CURRENT_RUBRIC_VERSION):
+        self.criteria = list(criteria)
+        self.rubric_version = rubric_version
+        self._projects = {}
+        self._cursor = None
+        self._lock = threading.Lock()
+
+    def sync(self, storage):
+        """ 套用上次同步之後的新選票；資料檔被改寫或清空時從頭重建 """
+        with self._lock:
+            rows, self._cursor, reset = storage.changes(self._cursor)
+            if reset:
+                self._projects = {}
+            self._apply_rows(rows)
+        return self
+
+    def _apply_rows(self, rows):
+        if rows.empty:
+            return
+        n = len(rows)
+        rows = apply_dtypes(rows)
+        def column(name):
+            return rows[name].tolist() if name in rows.columns else [float("nan")] * n
+        # 整批一次換算原始分數並以目前版本的權重重新計分
+        raw = raw_matrix(rows, self.criteria)
+        totals = score(raw, self.rubric_version, self.criteria).tolist()
+        raw = raw.tolist()
+        # 時間以整數 (微秒) 比較先後，不必逐筆轉字串；NaT 為最小值，與空白時間一樣排在最前面
+        if "Timestamp" in rows.columns:
+            stamps = rows["Timestamp"].to_numpy("datetime64[us]").view("int64").tolist()
+        else:
+            stamps = [MISSING_TIMESTAMP] * n
+        for i, (project, voter, voter_type, ts, feedback) in enumerate(zip(
+            column("Project"), column("Voter"), column(VOTER_TYPE_COL), stamps, column("Feedback"),
+        )):
+            if is_blank(project) or voter == SYSTEM_VOTER:
+                continue
+            if is_blank(voter_type):
+                voter_type = UNKNOWN_VOTER_TYPE
+            ballot = Ballot(ts, totals[i], tuple(raw[i]), feedback)
+            agg = self._projects.get(project)
+            if agg is None:
+                agg = self._projects[project] = ProjectAggregate(len(self.criteria))
+            agg.apply(voter, str(voter_type), ballot)
+
+    def project_view(self, project):
+        """ 回傳專案的統計快照：{"voter_types", "all", "groups"}；尚無選票時回傳 None """
+        with self._lock:
+            agg = self._projects.get(project)
+            if agg is None or not agg.latest:
+                return None
+            return {
+                "voter_types": sorted(t for t, g in agg.groups.items() if g.count > 0),
+                "all": agg.summary(self.criteria),
+                "groups": {t: agg.summary(self.criteria, t) for t, g in agg.groups.items() if g.count > 0},
+            }
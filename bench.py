@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateIndex
+from ingest import GroupCommitWriter
+from leaderboard import build_leaderboard, leaderboard_columns
+from perf import percentile, rss_bytes
+from rubric import RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION, rubric_weights, get_rubric_columns, get_csv_columns, rescore
+from snapshot import snapshot_dir
+from storage import VOTER_TYPE_COL, SYSTEM_VOTER, open_storage
+
+# 無頭執行的效能基準：合成資料、併發寫入、看板資料準備 (不含 Streamlit 元件)
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+FEEDBACK_SAMPLES = ["", "", "", "建議補充臨床驗證報告", "介接流程需再簡化", "資安文件完整", "希望提供熱區圖說明"]
+
+
+# --- 1. 合成資料 ---
+def synth_frame(rows, projects=50, voters=200, seed=0):
+    """ 以 get_csv_columns() 的實際欄位產生 rows 筆選票 (每個專案開頭一筆 SYSTEM_INIT)，分數為 0~100 原始分數 """
+    rng = np.random.default_rng(seed)
+    criteria = get_rubric_columns()
+    weights = np.array(list(rubric_weights().values()))
+    names = np.array([f"專案{i:03d}" for i in range(projects)])
+    voter_types = np.array(["院內", "院外"])
+
+    n = max(rows - projects, 0)
+    raw = rng.integers(0, 21, size=(n, len(criteria))) * 5
+    start = datetime(2024, 1, 1)
+    seconds = np.sort(rng.integers(0, 365 * 24 * 3600, size=n))
+    ballots = pd.DataFrame(raw.astype(float), columns=criteria)
+    ballots.insert(0, "Project", names[rng.integers(0, projects, size=n)])
+    ballots.insert(1, "Voter", np.char.add("評審", rng.integers(0, voters, size=n).astype(str)))
+    ballots.insert(2, VOTER_TYPE_COL, voter_types[rng.integers(0, 2, size=n)])
+    ballots.insert(3, "Timestamp", (pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S"))
+    ballots.insert(4, "Total Score", raw @ weights / 100)
+    ballots.insert(5, "Feedback", np.array(FEEDBACK_SAMPLES)[rng.integers(0, len(FEEDBACK_SAMPLES), size=n)])
+    ballots.insert(6, RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION)
+
+    init = pd.DataFrame({
+        "Project": names[:rows],
+        "Voter": SYSTEM_VOTER,
+        VOTER_TYPE_COL: voter_types[np.arange(min(projects, rows)) % 2],
+        "Timestamp": (start - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S"),
+        "Total Score": 0,
+    })
+    return pd.concat([init, ballots], ignore_index=True).reindex(columns=get_csv_columns())
+
+
+def synth(path, rows, projects=50, voters=200, seed=0):
+    for suffix in ("", ".catalog.json", ".lock"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.rmtree(snapshot_dir(path), ignore_errors=True)
+    synth_frame(rows, projects, voters, seed).to_csv(path, index=False)
+    return path
+
+
+def _fresh_storage(path, backend="csv"):
+    return open_storage(backend, path, get_csv_columns())
+
+
+# --- 2. 併發寫入 (送出評分的路徑) ---
+def _make_ballot(worker, i):
+    criteria = get_rubric_columns()
+    rec = {"Project": "壓測專案", "Voter": f"壓測{worker}-{i}", VOTER_TYPE_COL: "院內",
+           "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "Total Score": 70.0, "Feedback": f"第 {i} 張, 含逗號",
+           RUBRIC_VERSION_COL: CURRENT_RUBRIC_VERSION}
+    rec.update({name: 70.0 for name in criteria})
+    return rec
+
+
+def _ingest_worker(args):
+    """ 單一行程：T 個執行緒各送出 V 張選票，全部經過 GroupCommitWriter """
+    path, backend, proc, threads, votes = args
+    writer = GroupCommitWriter(_fresh_storage(path, backend))
+    latencies = []
+    lock = threading.Lock()
+
+    def run(t):
+        mine = [writer.submit(_make_ballot(f"{proc}.{t}", i)) for i in range(votes)]
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies, writer.stats()["avg_batch"]
+
+
+def bench_ingest(path, backend="csv", processes=1, threads=50, votes=4):
+    storage = _fresh_storage(path, backend)
+    storage.ensure_schema()
+    before = len(storage.load())
+    started = time.perf_counter()
+    jobs = [(path, backend, p, threads, votes) for p in range(processes)]
+    if processes == 1:
+        results = [_ingest_worker(jobs[0])]
+    else:
+        with multiprocessing.get_context("spawn").Pool(processes) as pool:
+            results = pool.map(_ingest_worker, jobs)
+    elapsed = time.perf_counter() - started
+    latencies = [l for lat, _ in results for l in lat]
+
+    df = _fresh_storage(path, backend).load()
+    expected = processes * threads * votes
+    written = df.iloc[before:]
+    return {
+        "bench": "ingest", "backend": backend, "rows_before": before,
+        "processes": processes, "threads": threads, "submissions": expected,
+        "seconds": elapsed, "votes_per_sec": expected / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000, "max_ms": max(latencies) * 1000,
+        "avg_batch": statistics.mean(b for _, b in results),
+        "lost_rows": expected - written["Voter"].nunique(),
+        "extra_rows": len(written) - expected,
+        "torn_rows": int(written[get_rubric_columns()].isna().any(axis=1).sum()),
+        "rows_after": len(df),
+    }
+
+
+# --- 3. 評分 API 尖峰 (vote_api.py)：N 位評審同時連線、同時送出 ---
+async def _http(reader, writer, method, path, body=None):
+    data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("utf-8") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        key, _, value = line.decode("latin-1").partition(":")
+        if key.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _api_burst(host, port, voters, tag):
+    """ 每位評審一條 keep-alive 連線：先全部連上並載入表單，量 RSS，再同時送出選票 """
+    started = time.perf_counter()
+    conns = await asyncio.gather(*(asyncio.open_connection(host, port) for _ in range(voters)))
+    await asyncio.gather(*(_http(r, w, "GET", "/?project=API") for r, w in conns))
+    connect_ms = (time.perf_counter() - started) * 1000
+    _, stats = await _http(*conns[0], "GET", "/api/stats")
+    connected = json.loads(stats)
+
+    scores = {name: 70 for name in get_rubric_columns()}
+    async def vote(i, reader, writer):
+        t = time.perf_counter()
+        status, _ = await _http(reader, writer, "POST", "/api/ballot", {"project": "API壓測", "voter": f"{tag}-{i}", "scores": scores})
+        return status, time.perf_counter() - t
+    started = time.perf_counter()
+    results = await asyncio.gather(*(vote(i, r, w) for i, (r, w) in enumerate(conns)))
+    elapsed = time.perf_counter() - started
+    _, stats = await _http(*conns[0], "GET", "/api/stats")
+    for _, w in conns:
+        w.close()
+    return connect_ms, connected, json.loads(stats), results, elapsed
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_api(path, backend="csv", voters=500, url=None):
+    """ 對本機 vote_api 實例 (未指定 url 時自動啟動一個) 做評審尖峰：連線記憶體與提交延遲 """
+    server = None
+    if url is None:
+        port = _free_port()
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "vote_api.py"),
+                                   "--host", "127.0.0.1", "--port", str(port), "--backend", backend, "--path", path],
+                                  stdout=subprocess.DEVNULL)
+        host = "127.0.0.1"
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                break
+            except OSError:
+                if time.time() > deadline or server.poll() is not None:
+                    server.kill()
+                    raise RuntimeError("vote_api 啟動失敗")
+                time.sleep(0.1)
+    else:
+        parts = urllib.parse.urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+    tag = f"api{int(time.time())}"
+    try:
+        connect_ms, connected, after, results, elapsed = asyncio.run(_api_burst(host, port, voters, tag))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    latencies = [lat for status, lat in results if status == 200]
+    written = set(_fresh_storage(path, backend).load()["Voter"].astype(str)) if url is None else None
+    return {
+        "bench": "api", "backend": backend, "voters": voters, "connect_ms": connect_ms,
+        "rss_baseline_mb": connected["baseline_rss_mb"], "rss_connected_mb": connected["rss_mb"],
+        "per_connection_kb": connected["per_connection_kb"], "rss_after_mb": after["rss_mb"],
+        "seconds": elapsed, "votes_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000, "max_ms": max(latencies, default=0.0) * 1000,
+        "server_commit_p99_ms": after["ingest"]["p99_ms"], "avg_batch": after["ingest"]["avg_batch"],
+        "errors": len(results) - len(latencies),
+        "lost_rows": sum(f"{tag}-{i}" not in written for i in range(voters)) if written is not None else None,
+    }
+
+
+# --- 4. 看板資料準備 (載入、篩選、去重、彙總) ---
+def _timed(fn, repeat=1):
+    best, result = None, None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def bench_render(path, backend="csv", repeat=3):
+    """ 分段計時看板每次刷新要做的資料準備，與 Streamlit 元件渲染分開量測 """
+    result = {"bench": "render", "backend": backend, "file_mb": os.path.getsize(path) / 2**20 if backend == "csv" else None}
+    storage = _fresh_storage(path, backend)
+    result["cold_load_ms"], df = _timed(lambda: _fresh_storage(path, backend).load(), repeat)
+    result["rows"] = len(df)
+    result["load_mb"] = df.memory_usage(deep=True).sum() / 2**20
+    result["catalog_cold_ms"], _ = _timed(storage.catalog)
+    result["projects_warm_ms"], projects = _timed(storage.projects, repeat)
+    project = projects[len(projects) // 2] if projects else ""
+    result["project_type_warm_ms"], _ = _timed(lambda: storage.project_type(project), repeat)
+    result["filter_dedup_ms"], _ = _timed(lambda: storage.latest_ballots(project), repeat)
+    result["history_load_ms"], history = _timed(lambda: storage.load_project(project), repeat)
+    result["history_mb"] = history.memory_usage(deep=True).sum() / 2**20
+    result["rescore_all_ms"], _ = _timed(lambda: rescore(df), repeat)
+    result["leaderboard_ms"], _ = _timed(lambda: build_leaderboard(storage.load(leaderboard_columns())), repeat)
+
+    index = AggregateIndex(get_rubric_columns())
+    result["aggregate_cold_ms"], _ = _timed(lambda: index.sync(storage))
+    result["project_view_ms"], _ = _timed(lambda: index.project_view(project), repeat)
+    result["version_check_ms"], _ = _timed(storage.version, repeat)
+
+    storage.append([_make_ballot("render", 0)])
+    result["aggregate_incremental_ms"], _ = _timed(lambda: index.sync(storage))
+    result["rss_mb"] = rss_bytes() / 2**20
+    return result
+
+
+# --- 5. 輸出 ---
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(), "time": datetime.now().isoformat(timespec="seconds")}
+
+
+def write_results(results, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": _meta(), "results": results}, f, ensure_ascii=False, indent=2)
+    for r in results:
+        print(json.dumps(r, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="投票寫入與看板資料準備的效能基準")
+    parser.add_argument("--data-dir", default="bench_data")
+    parser.add_argument("--json", default="bench_results.json", help="機器可讀結果輸出路徑")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--compact", action="store_true", help="量測前先把 CSV 壓實成欄式快照 (僅 csv 後端)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("synth", help="產生 vote_data_<rows>.csv")
+    p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--projects", type=int, default=50)
+    p.add_argument("--voters", type=int, default=200)
+
+    p = sub.add_parser("ingest", help="N 個行程 × T 個執行緒同時送出評分")
+    p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--processes", type=int, default=1)
+    p.add_argument("--threads", type=int, default=50)
+    p.add_argument("--votes", type=int, default=4, help="每個執行緒送出的張數")
+
+    p = sub.add_parser("render", help="看板資料準備分段計時")
+    p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--repeat", type=int, default=3)
+
+    p = sub.add_parser("api", help="vote_api.py 評審尖峰 (連線記憶體與提交延遲)")
+    p.add_argument("--rows", type=int, nargs="+", default=[1_000])
+    p.add_argument("--voters", type=int, default=500)
+    p.add_argument("--url", help="對既有的 vote_api 實例量測 (預設自動啟動一個本機實例)")
+
+    p = sub.add_parser("all", help="synth + render + ingest + api")
+    p.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES)
+    p.add_argument("--processes", type=int, default=2)
+    p.add_argument("--threads", type=int, default=50)
+    p.add_argument("--votes", type=int, default=2)
+    p.add_argument("--voters", type=int, default=500)
+
+    args = parser.parse_args()
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for rows in args.rows:
+        csv_path = os.path.join(args.data_dir, f"vote_data_{rows}.csv")
+        if args.cmd in ("synth", "all") or not os.path.exists(csv_path):
+            synth(csv_path, rows, getattr(args, "projects", 50), getattr(args, "voters", 200))
+        path = csv_path
+        compact_ms = None
+        if args.compact and args.backend == "csv":
+            compact_ms, _ = _timed(_fresh_storage(csv_path).compact)
+        if args.backend == "sqlite":
+            from storage import migrate_csv_to_sqlite
+            path = csv_path[:-4] + ".db"
+            if os.path.exists(path):
+                os.remove(path)
+            migrate_csv_to_sqlite(path, [csv_path])
+        if args.cmd in ("render", "all"):
+            results.append({"size": rows, "compact_ms": compact_ms, **bench_render(path, args.backend, getattr(args, "repeat", 3))})
+        if args.cmd in ("ingest", "all"):
+            results.append({"size": rows, **bench_ingest(path, args.backend, args.processes, args.threads, args.votes)})
+        if args.cmd in ("api", "all"):
+            results.append({"size": rows, **bench_api(path, args.backend, args.voters, getattr(args, "url", None))})
+    if results:
+        write_results(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import io
+import threading
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import perf
+from snapshot import COMPRESSION
+from storage import CATEGORICAL_COLS, DATETIME_COLS, SYSTEM_VOTER, apply_dtypes, normalize_voter_type, SCORE_COLS
+
+# 匯出檔只在按下下載時產生：從儲存後端分段讀出、分段編碼；
+# 每個 (格式, 專案) 只快取目前資料版本的一份，版本變動時直接取代，舊版本不會留在記憶體
+CSV_ENCODING = "utf-8-sig"
+
+
+def _chunks(storage, project):
+    """ 指定專案時與看板紀錄表一致：排除 SYSTEM_INIT 列並補上評審類別；全部專案則原樣匯出 """
+    for chunk in storage.iter_history(project):
+        if project is not None and not chunk.empty:
+            chunk = normalize_voter_type(chunk[chunk["Voter"] != SYSTEM_VOTER])
+        yield chunk
+
+
+def iter_csv(storage, project=None):
+    """ 逐段產生 CSV 位元組，第一段帶 BOM 與表頭 (Excel 開啟中文不會亂碼) """
+    first = True
+    for chunk in _chunks(storage, project):
+        if first or not chunk.empty:
+            yield chunk.to_csv(index=False, header=first).encode(CSV_ENCODING if first else "utf-8")
+            first = False
+
+
+def _arrow_schema(columns):
+    fields = []
+    for col in columns:
+        if col in CATEGORICAL_COLS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        elif col in DATETIME_COLS:
+            fields.append(pa.field(col, pa.timestamp("us")))
+        elif col in SCORE_COLS:
+            fields.append(pa.field(col, pa.float32()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    return pa.schema(fields)
+
+
+def parquet_bytes(storage, project=None):
+    """ 分段寫入同一個 Parquet 檔 (類別欄位 + 時間 + float32 分數)，不把所有列組成一個 DataFrame """
+    buf = io.BytesIO()
+    writer = None
+    for chunk in _chunks(storage, project):
+        if writer is None:
+            schema = _arrow_schema(chunk.columns)
+            writer = pq.ParquetWriter(buf, schema, compression=COMPRESSION)
+        if not chunk.empty:
+            table = pa.Table.from_pandas(apply_dtypes(chunk), preserve_index=False)
+            writer.write_table(table.cast(schema))
+    if writer is not None:
+        writer.close()
+    return buf.getvalue()
+
+
+_exports = {}
+_exports_lock = threading.Lock()
+
+
+def _export(storage, kind, project, version):
+    key = (storage, kind, project)
+    with _exports_lock:
+        hit = _exports.get(key)
+    if hit is not None and hit[0] == version:
+        return hit[1]
+    with perf.timed(f"export.{kind}") as t:
+        data = b"".join(iter_csv(storage, project)) if kind == "csv" else parquet_bytes(storage, project)
+        t["bytes"] = len(data)
+    with _exports_lock:
+        _exports[key] = (version, data)
+    return data
+
+
+def export_csv(storage, project=None):
+    """ 專案 (或全部專案) 的完整紀錄 CSV，資料版本沒變時直接回傳快取 """
+    return _export(storage, "csv", project, storage.version())
+
+
+def export_parquet(storage, project=None):
+    """ 專案 (或全部專案) 的完整紀錄 Parquet，資料版本沒變時直接回傳快取 """
+    return _export(storage, "parquet", project, storage.version())
@@ -0,0 +1,112 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import perf
+from perf import percentile
+
+# 等待同一批選票的時間窗 (秒) 與單批上限
+GROUP_COMMIT_WINDOW = 0.005
+GROUP_COMMIT_MAX_BATCH = 500
+
+logger = logging.getLogger("vote.ingest")
+
+
+class _Ticket:
+    __slots__ = ("record", "start", "future")
+
+    def __init__(self, record):
+        self.record = record
+        self.start = time.perf_counter()
+        self.future = Future()
+
+
+class GroupCommitWriter:
+    """ 選票寫入佇列：數毫秒內到達的選票合併成一次上鎖寫入 (group commit)，並記錄每張選票的提交延遲 """
+
+    def __init__(self, storage, window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH, history=2000):
+        self.storage = storage
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=history)
+        self._batch_sizes = deque(maxlen=history)
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="vote-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, record, timeout=30):
+        """ 送出一張選票並等到寫入完成，回傳提交延遲 (秒)；寫入失敗時拋出原本的例外。
+        逾時時若選票仍在佇列中就撤回 (不會寫入)，已在寫入中則無法撤回，訊息會註明 """
+        future = self.submit_future(record)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise TimeoutError("選票寫入逾時，這張選票未寫入") from None
+            raise TimeoutError("選票寫入逾時，這張選票可能仍會寫入") from None
+
+    def submit_future(self, record):
+        """ 不阻塞的版本：回傳 concurrent.futures.Future，寫入完成後結果為提交延遲 (秒)；
+        asyncio 端可用 asyncio.wrap_future 等待，不必為每張選票占用一個執行緒 """
+        ticket = _Ticket(record)
+        self._queue.put(ticket)
+        return ticket.future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        # 等待端已取消的選票 (例如 API 連線中斷、submit 逾時) 不寫入；其餘標記為執行中，之後就不能再取消
+        batch = [t for t in batch if t.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        error = None
+        try:
+            with perf.timed("storage.append") as info:
+                self.storage.append([t.record for t in batch])
+                info["rows"] = len(batch)
+        except Exception as e:
+            error = e
+        now = time.perf_counter()
+        latencies = [now - t.start for t in batch]
+        if error is None:
+            with self._stats_lock:
+                self._latencies.extend(latencies)
+                self._batch_sizes.append(len(batch))
+        for t, latency in zip(batch, latencies):
+            # 個別選票的通知出錯不能讓寫入執行緒結束，否則之後的選票都會逾時
+            try:
+                if error is None:
+                    t.future.set_result(latency)
+                else:
+                    t.future.set_exception(error)
+            except Exception:
+                logger.exception("選票寫入結果通知失敗")
+
+    def stats(self):
+        """ 最近提交的延遲統計 (毫秒) 與平均每批筆數 """
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            sizes = list(self._batch_sizes)
+        return {
+            "submissions": len(latencies),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": max(latencies, default=0.0) * 1000,
+            "avg_batch": sum(sizes) / len(sizes) if sizes else 0.0,
+        }
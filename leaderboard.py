@@ -0,0 +1,93 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+import perf
+from aggregates import STATUS_LABELS, STATUS_THRESHOLDS
+from rubric import RUBRICS, RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION, get_rubric_columns, raw_matrix, rubric_weights, score
+from storage import BALLOT_KEY, SYSTEM_VOTER, VOTER_TYPE_COL, normalize_voter_type
+
+# 跨專案排行榜：所有專案的最新選票一次 groupby 彙總，依資料版本快取
+LEADERBOARD_CACHE_SIZE = 4
+
+
+def leaderboard_columns(rubric_version=CURRENT_RUBRIC_VERSION):
+    """ 排行榜實際用到的欄位 (不讀 Feedback 等文字欄位) """
+    return ["Project", "Voter", VOTER_TYPE_COL, "Timestamp", RUBRIC_VERSION_COL] + get_rubric_columns(rubric_version)
+
+
+def latest_ballots_all(df):
+    """ 所有專案中，每位評審 (專案 + 姓名 + 類別) 最後一次提交的選票 """
+    if df.empty or "Voter" not in df.columns:
+        return df.iloc[0:0]
+    ballots = normalize_voter_type(df[(df["Voter"] != SYSTEM_VOTER) & df["Project"].notna()])
+    return ballots.sort_values("Timestamp", kind="stable", na_position="first").drop_duplicates(subset=["Project"] + BALLOT_KEY, keep="last")
+
+
+def decision_band(avg):
+    """ 與 aggregates.status_of 相同的門檻，一次套用在整欄平均總分 """
+    avg = np.asarray(avg, dtype=float)
+    return np.select([avg >= t for t in STATUS_THRESHOLDS], STATUS_LABELS[:-1], STATUS_LABELS[-1])
+
+
+def build_leaderboard(df, rubric_version=CURRENT_RUBRIC_VERSION):
+    """ 回傳依平均總分排序的專案排名：決策結論、投票人數、各類別得分 (一~四) 與各評審類別的平均/人數 """
+    ballots = latest_ballots_all(df)
+    if ballots.empty:
+        return pd.DataFrame()
+    criteria = get_rubric_columns(rubric_version)
+    raw = raw_matrix(ballots, criteria)
+    filled = np.nan_to_num(raw)
+
+    # 每張選票的總分與各類別得分 (類別滿分 = 該類別權重合計)；
+    # 與 score() 相同，缺答的選票依實際作答的權重換算回滿分，各類別加總才會等於總分
+    parts = {"總分": score(raw, rubric_version, criteria)}
+    weights = rubric_weights(rubric_version)
+    possible = (~np.isnan(raw)) @ np.array([weights[name] for name in criteria])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(possible > 0, sum(weights.values()) / possible, np.nan)
+    categories = list(RUBRICS[rubric_version])
+    for cat, items in RUBRICS[rubric_version].items():
+        idx = [criteria.index(name) for name, _ in items]
+        parts[cat] = filled[:, idx] @ np.array([w for _, w in items]) / 100 * scale
+    frame = pd.DataFrame(parts)
+    # 快照讀回的專案名稱為類別欄位，直接沿用 (不轉字串) 讓 groupby 走類別代碼
+    frame["Project"] = ballots["Project"].array
+    frame[VOTER_TYPE_COL] = ballots[VOTER_TYPE_COL].array
+
+    # 唯一一次掃過全部選票的 groupby：(專案, 評審類別) 的加總與筆數，其餘都由這張小表推得
+    grouped = frame.groupby(["Project", VOTER_TYPE_COL], sort=False, observed=True).agg(
+        votes=("總分", "size"), total_sum=("總分", "sum"), total_n=("總分", "count"),
+        **{f"{cat}_sum": (cat, "sum") for cat in categories},
+    )
+    per_project = grouped.groupby(level="Project", observed=True).sum()
+
+    board = pd.DataFrame(index=per_project.index)
+    board["平均總分"] = per_project["total_sum"] / per_project["total_n"].replace(0, np.nan)
+    board["決策結論"] = decision_band(board["平均總分"])
+    board["投票人數"] = per_project["votes"]
+    for cat in categories:
+        board[cat] = per_project[f"{cat}_sum"] / per_project["total_n"].replace(0, np.nan)
+    by_type = grouped["total_sum"].div(grouped["total_n"].replace(0, np.nan)).unstack(VOTER_TYPE_COL)
+    counts = grouped["votes"].unstack(VOTER_TYPE_COL).fillna(0).astype(int)
+    for voter_type in sorted(by_type.columns):
+        board[f"{voter_type}平均"] = by_type[voter_type]
+        board[f"{voter_type}人數"] = counts[voter_type]
+
+    board = board.sort_values(["平均總分", "投票人數"], ascending=False, na_position="last")
+    board.insert(0, "排名", np.arange(1, len(board) + 1))
+    return board.rename_axis("專案").reset_index()
+
+
+@functools.lru_cache(maxsize=LEADERBOARD_CACHE_SIZE)
+def _cached(storage, version, rubric_version):
+    with perf.timed("leaderboard.build") as t:
+        board = build_leaderboard(storage.load(leaderboard_columns(rubric_version)), rubric_version)
+        t["projects"] = len(board)
+    return board
+
+
+def project_leaderboard(storage, rubric_version=CURRENT_RUBRIC_VERSION):
+    """ 依資料版本快取的排行榜 (呼叫端請勿就地修改回傳的 DataFrame) """
+    return _cached(storage, storage.version(), rubric_version)
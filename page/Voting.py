@@ -1,51 +1,44 @@
 import streamlit as st
-import pandas as pd
 import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import VOTER_TYPE_COL, LEGACY_PROJECT, open_default_storage
+from ingest import GroupCommitWriter
+from rubric import RUBRIC, RUBRIC_CONTENT, RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION, weighted_total
 
 st.set_page_config(page_title="評分問卷", layout="centered")
 
-# --- 評分標準 (需與主程式一致) ---
-RUBRIC = {
-    "一、臨床卓越與安全性 (35%)": [
-        ("1. 模型準確度與臨床一致性", 14.0),
-        ("2. 異常值偵測與風險警示", 10.5),
-        ("3. 病患安全防護機制", 10.5)
-    ],
-    "二、系統整合與資安 (25%)": [
-        ("5. 院內系統整合度", 8.75),
-        ("6. 資安合規性", 8.75),
-        ("7. 系統維運與更新機制", 7.5)
-    ],
-    "三、負責性 AI 與治理 (25%)": [
-        ("9. 可解釋性與透明度", 8.75),
-        ("10. 人類監督機制", 8.75),
-        ("12. 模型生命週期管理", 7.5)
-    ],
-    "四、營運效益與創新價值 (15%)": [
-        ("13. 成本效益分析", 7.5),
-        ("15. 病患體驗與衛教應用", 4.5),
-        ("16. ESG 與永續指標", 3.0)
-    ]
-}
+# --- 評分標準與資料檔皆與主程式共用 (rubric.py / storage.py) ---
+VOTER_TYPES = ["院內", "院外"]
+
+@st.cache_resource
+def get_storage():
+    return open_default_storage()
 
-FILE_NAME = "vote_data.csv"
-VOTER_TYPE_COL = "Voter Type"
-VOTER_TYPES = ["院內", "院外"]
+@st.cache_resource
+def get_writer():
+    """ 與主程式相同：同時送出的選票經 group commit 佇列合併成一次上鎖寫入 """
+    return GroupCommitWriter(get_storage())
+
+# 網址沒有帶專案名稱時，沿用舊版問卷的專案名稱
+project_name = st.query_params.get("project", LEGACY_PROJECT)
 
 st.header("📝 AI 軟體評估表")
 st.markdown("請針對各項目滑動評分 (0-100)，完成後請點擊最下方的提交按鈕。")
 
 # 投票表單
 with st.form("vote_form"):
-    voter_name = st.text_input("評審姓名 (請輸入您的姓名)", placeholder="例如：王大明醫師")
-    voter_type = st.radio("評審來源", VOTER_TYPES, horizontal=True)
+    voter_name = st.text_input("評審姓名 (請輸入您的姓名)", placeholder="例如：王大明醫師")
+    voter_type = st.radio("評審來源", VOTER_TYPES, horizontal=True)
     
     scores = {}
     for category, criteria_list in RUBRIC.items():
         st.subheader(category)
         for criterion, weight in criteria_list:
             # 預設值 70 分
-            scores[criterion] = st.slider(f"{criterion}", 0, 100, 70, key=criterion)
+            scores[criterion] = st.slider(f"{criterion}", 0, 100, 70, key=criterion, help=RUBRIC_CONTENT.get(criterion))
             st.caption(f"此題權重：{weight} 分")
     
     st.divider()
@@ -55,30 +48,18 @@ if submitted:
     if not voter_name:
         st.error("請輸入評審姓名後再提交！")
     else:
-        # 計算邏輯
-        vote_record = {"Voter": voter_name, VOTER_TYPE_COL: voter_type}
-        total_weighted_score = 0
-        
-        for category, criteria_list in RUBRIC.items():
-            for criterion, weight in criteria_list:
-                raw_score = scores[criterion]
-                # 加權分數 = (原始分數 / 100) * 權重
-                weighted_score = (raw_score / 100) * weight
-                vote_record[criterion] = weighted_score
-                total_weighted_score += weighted_score
-        
-        vote_record["Total Score"] = total_weighted_score
-        
-        # 寫入 CSV (使用 append 模式)
-        df_new = pd.DataFrame([vote_record])
-        if not os.path.exists(FILE_NAME):
-            df_new.to_csv(FILE_NAME, index=False)
-        else:
-            df_existing = pd.read_csv(FILE_NAME)
-            if VOTER_TYPE_COL not in df_existing.columns:
-                df_existing[VOTER_TYPE_COL] = "未分類"
-                df_existing.to_csv(FILE_NAME, index=False)
-            df_new.reindex(columns=df_existing.columns).to_csv(FILE_NAME, mode='a', header=False, index=False)
-            
-        st.success("✅ 評分已成功送出！請通知主持人查看即時結果。")
-        st.balloons()
+        # 存原始分數 (0~100) 與評分版本，加權總分由 rubric.py 計算
+        vote_record = {"Project": project_name, "Voter": voter_name, VOTER_TYPE_COL: voter_type,
+                       "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                       "Total Score": weighted_total(scores), RUBRIC_VERSION_COL: CURRENT_RUBRIC_VERSION}
+        vote_record.update(scores)
+
+        # 與主程式寫入同一個儲存後端 (上鎖後追加，不整份重寫)
+        try:
+            latency = get_writer().submit(vote_record)
+        except TimeoutError as e:
+            st.error(f"❌ {e}，請稍後確認看板後再決定是否重新提交。")
+        else:
+            st.success("✅ 評分已成功送出！請通知主持人查看即時結果。")
+            st.caption(f"寫入耗時 {latency * 1000:.0f} ms")
+            st.balloons()
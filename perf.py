@@ -0,0 +1,146 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組
+    resource = None
+
+# 效能量測預設關閉：設定 VOTE_PERF=1，或在看板 ?diag=1 診斷面板中開啟 (也可在面板中關閉)
+WINDOW = 500
+
+logger = logging.getLogger("vote.perf")
+
+_enabled = os.environ.get("VOTE_PERF", "") not in ("", "0")
+_timings = {}
+_info = {}
+_gauges = {}
+_lock = threading.Lock()
+_local = threading.local()
+_DISABLED = nullcontext({})
+
+
+def percentile(values, q):
+    """ 以最近鄰法取百分位數 (q 介於 0~100)，values 為空時回傳 0 """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def rss_bytes():
+    """ 目前行程的常駐記憶體 (RSS)；沒有 /proc 的平台改回報最高 RSS """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    """ 開啟/關閉量測 (整個行程共用)；第一次開啟時補上 log handler，讓 JSON 紀錄輸出到 stderr """
+    global _enabled
+    _enabled = flag
+    if flag and not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+
+def _record(name, ms, info):
+    with _lock:
+        samples = _timings.get(name)
+        if samples is None:
+            samples = _timings[name] = deque(maxlen=WINDOW)
+        samples.append(ms)
+        if info:
+            _info[name] = dict(info)
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.append({"name": name, "ms": round(ms, 3), **info})
+
+
+@contextmanager
+def _timer(name):
+    info = {}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        _record(name, (time.perf_counter() - start) * 1000, info)
+
+
+def timed(name):
+    """ 計時一段程式碼，可在回傳的 dict 填入 rows/bytes 等附加資訊；未啟用時幾乎零成本 """
+    if not _enabled:
+        return _DISABLED
+    return _timer(name)
+
+
+def gauge(name, value):
+    """ 記錄最新的數值 (例如資料列數、檔案大小) """
+    if _enabled:
+        with _lock:
+            _gauges[name] = value
+
+
+@contextmanager
+def run_scope(name, **context):
+    """ 包住一次 rerun：結束時輸出一行 JSON，列出這次 rerun 內每段計時；巢狀呼叫只算一段計時 """
+    if not _enabled:
+        yield
+        return
+    if getattr(_local, "run", None) is not None:
+        with _timer(name):
+            yield
+        return
+    _local.run = []
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        steps, _local.run = _local.run, None
+        total = (time.perf_counter() - start) * 1000
+        _record(name, total, {})
+        with _lock:
+            gauges = dict(_gauges)
+        logger.info(json.dumps({"run": name, "total_ms": round(total, 3), **context, "steps": steps, "gauges": gauges}, ensure_ascii=False, default=str))
+
+
+def snapshot():
+    """ 各量測點最近 WINDOW 次的 p50/p95/max (毫秒) 與最後一次的附加資訊 """
+    with _lock:
+        items = [(name, list(samples), _info.get(name, {})) for name, samples in _timings.items()]
+        gauges = dict(_gauges)
+    rows = [
+        {"name": name, "count": len(samples), "p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95), "max_ms": max(samples), **info}
+        for name, samples, info in sorted(items)
+    ]
+    return rows, gauges
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _info.clear()
+        _gauges.clear()
+
+
+if _enabled:
+    enable()
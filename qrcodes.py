@@ -0,0 +1,36 @@
+import functools
+import io
+import urllib.parse
+
+import segno
+
+DEFAULT_BASE_URL = "https://shinkong-ai-vote.streamlit.app"
+QR_CACHE_SIZE = 128
+
+
+def voting_link(base_url, project):
+    """ 手機評分網址：<base_url>/?page=vote&project=<專案名稱> """
+    return f"{base_url.rstrip('/')}/?page=vote&project={urllib.parse.quote(project)}"
+
+
+def _scale_for(qr, size):
+    width, _ = qr.symbol_size(scale=1)
+    return max(1, size // width)
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_png(project, base_url, size=150):
+    """ 在本機產生評分連結的 QR Code (PNG bytes)，依 (專案, 網址, 尺寸) 快取，不需連外 """
+    qr = segno.make(voting_link(base_url, project), error="m")
+    buf = io.BytesIO()
+    qr.save(buf, kind="png", scale=_scale_for(qr, size))
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_svg(project, base_url, size=150):
+    """ 同 qr_png，輸出 SVG bytes (大螢幕縮放不失真) """
+    qr = segno.make(voting_link(base_url, project), error="m")
+    buf = io.BytesIO()
+    qr.save(buf, kind="svg", scale=_scale_for(qr, size))
+    return buf.getvalue()
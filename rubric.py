@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+# 完整 16 條評核指標內容與權重定義 (總分 100)
+RUBRIC_CONTENT = {
+    "1. 模型準確度與臨床一致性": "評核 AUC/感度/特異性是否達標。方式：查驗臨床驗證報告與 TFDA 許可證。",
+    "2. 異常值偵測與風險警示": "辨識無法判讀影像之能力。方式：測試高風險病灶之即時通報機制。",
+    "3. 病患安全防護機制": "防止過度診斷。方式：確認具備『醫師覆核』流程，而非 AI 自動發報。",
+    "4. 臨床工作流適應性": "是否符合現有診斷流程。方式：評估醫師操作步驟是否增加負擔或能簡化流程。",
+    "5. 院內系統整合度": "支援 DICOM/HL7 指標。方式：觀察與 PACS/HIS 介接流暢度 (建議 < 5秒)。",
+    "6. 資安合規性": "數據傳輸加密。方式：查驗 ISO 27001 認證或資安漏洞掃描報告。",
+    "7. 系統維運與更新機制": "系統穩定性。方式：確認當機備援方案 (DR) 及廠商 SLA 支援能力。",
+    "8. 數據隱私與去識別化": "保護病患隱私。方式：查驗資料產出、傳輸及儲存是否落實去識別化規範。",
+    "9. 可解釋性與透明度": "非黑箱 AI。方式：確認是否提供 Heatmap (熱區圖) 或信心度評分。",
+    "10. 人類監督機制": "醫師最高權限。方式：測試醫師是否能更正結果並保留修改軌跡。",
+    "11. 偏差檢測與公平性": "避免演算法歧視。方式：查驗模型在不同性別、年齡層之效能是否穩定無顯著偏差。",
+    "12. 模型生命週期管理": "效能不隨時間下降。方式：確認廠商有無監控效能偏移 (Drift) 機制。",
+    "13. 成本效益分析": "ROI 評估。方式：評估是否縮短判讀時程 (TAT) 或降低檢查支出。",
+    "14. 市場實績與品牌信譽": "產品成熟度。方式：查驗國內外醫學中心採用實績及廠商財務/技術服務穩定度。",
+    "15. 病患體驗與衛教應用": "醫病溝通。方式：查驗 AI 報告是否具備圖形化輸出供病患參考。",
+    "16. ESG 與永續指標": "社會責任。方式：評估無紙化程度及對偏鄉醫療可近性之提升。"
+}
+
+# 選票存的是 0~100 的原始分數與評分時的版本；加權總分一律由下方引擎依版本權重計算。
+# 調整權重時新增一個版本並改 CURRENT_RUBRIC_VERSION，歷史選票會自動以新權重重新計分。
+RUBRIC_VERSION_COL = "Rubric Version"
+VOTER_TYPE_COL = "Voter Type"
+
+RUBRICS = {
+    # v1：舊版 page/Voting.py 的 12 條指標
+    1: {
+        "一、臨床卓越與安全性 (35%)": [
+            ("1. 模型準確度與臨床一致性", 14.0), ("2. 異常值偵測與風險警示", 10.5),
+            ("3. 病患安全防護機制", 10.5)
+        ],
+        "二、系統整合與資安 (25%)": [
+            ("5. 院內系統整合度", 8.75), ("6. 資安合規性", 8.75),
+            ("7. 系統維運與更新機制", 7.5)
+        ],
+        "三、負責性 AI 與治理 (25%)": [
+            ("9. 可解釋性與透明度", 8.75), ("10. 人類監督機制", 8.75),
+            ("12. 模型生命週期管理", 7.5)
+        ],
+        "四、營運效益與創新價值 (15%)": [
+            ("13. 成本效益分析", 7.5), ("15. 病患體驗與衛教應用", 4.5),
+            ("16. ESG 與永續指標", 3.0)
+        ]
+    },
+    # v2：16 條指標
+    2: {
+        "一、臨床卓越與安全性 (35%)": [
+            ("1. 模型準確度與臨床一致性", 10.0), ("2. 異常值偵測與風險警示", 9.0), 
+            ("3. 病患安全防護機制", 8.0), ("4. 臨床工作流適應性", 8.0)
+        ],
+        "二、系統整合與資安 (25%)": [
+            ("5. 院內系統整合度", 7.0), ("6. 資安合規性", 7.0), 
+            ("7. 系統維運與更新機制", 6.0), ("8. 數據隱私與去識別化", 5.0)
+        ],
+        "三、負責性 AI 與治理 (25%)": [
+            ("9. 可解釋性與透明度", 7.0), ("10. 人類監督機制", 7.0), 
+            ("11. 偏差檢測與公平性", 5.0), ("12. 模型生命週期管理", 6.0)
+        ],
+        "四、營運效益與創新價值 (15%)": [
+            ("13. 成本效益分析", 5.0), ("14. 市場實績與品牌信譽", 4.0),
+            ("15. 病患體驗與衛教應用", 3.0), ("16. ESG 與永續指標", 3.0)
+        ]
+    },
+}
+
+CURRENT_RUBRIC_VERSION = 2
+RUBRIC = RUBRICS[CURRENT_RUBRIC_VERSION]
+
+def rubric_weights(version=CURRENT_RUBRIC_VERSION):
+    return {name: weight for items in RUBRICS[version].values() for name, weight in items}
+
+def get_rubric_columns(version=CURRENT_RUBRIC_VERSION):
+    return list(rubric_weights(version))
+
+def get_csv_columns():
+    return ["Project", "Voter", VOTER_TYPE_COL, "Timestamp", "Total Score", "Feedback", RUBRIC_VERSION_COL] + get_rubric_columns()
+
+def weighted_total(raw_scores, version=CURRENT_RUBRIC_VERSION):
+    """ 單張選票的加權總分：raw_scores 為 {指標: 0~100 原始分數} """
+    return sum(raw_scores[name] / 100 * weight for name, weight in rubric_weights(version).items() if name in raw_scores)
+
+# --- 向量化計分引擎：整批選票 (列) × 指標 (欄) 一次計算 ---
+ALL_CRITERIA = list(dict.fromkeys(name for v in sorted(RUBRICS) for name in get_rubric_columns(v)))
+
+def _weight_vector(version, criteria):
+    weights = rubric_weights(version)
+    return np.array([weights.get(name, np.nan) for name in criteria], dtype=float)
+
+def _infer_legacy_version(answered, criteria):
+    """ 沒有版本欄的舊選票：取第一個涵蓋所有已作答指標的版本 (只答了 12 條者為 v1，其餘為 v2) """
+    versions = np.full(len(answered), max(RUBRICS), dtype=int)
+    undecided = np.ones(len(answered), dtype=bool)
+    for version in sorted(RUBRICS):
+        outside = np.isnan(_weight_vector(version, criteria))
+        fits = undecided & ~(answered & outside).any(axis=1)
+        versions[fits] = version
+        undecided &= ~fits
+    return versions
+
+def raw_matrix(df, criteria=None):
+    """ 取出 0~100 原始分數矩陣；舊資料 (沒有版本) 存的是加權分數，依當時的權重換回原始分數 """
+    criteria = list(criteria or ALL_CRITERIA)
+    if df.empty:
+        return np.empty((0, len(criteria)))
+    # 以欄為主的矩陣逐欄填入，數值欄位不必再轉型
+    raw = np.full((len(df), len(criteria)), np.nan, order="F")
+    for j, name in enumerate(criteria):
+        if name in df.columns:
+            col = df[name] if pd.api.types.is_numeric_dtype(df[name]) else pd.to_numeric(df[name], errors="coerce")
+            raw[:, j] = col.to_numpy(dtype=float, na_value=np.nan)
+    if RUBRIC_VERSION_COL in df.columns:
+        legacy = pd.to_numeric(df[RUBRIC_VERSION_COL], errors="coerce").isna().to_numpy()
+    else:
+        legacy = np.ones(len(df), dtype=bool)
+    if legacy.any():
+        values = raw[legacy]
+        versions = _infer_legacy_version(~np.isnan(values), criteria)
+        order = sorted(RUBRICS)
+        weights = np.vstack([_weight_vector(v, criteria) for v in order])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 分數以 float32 讀入只有約 7 位有效數字，換回原始分數後取到小數 4 位，避免 74.99999 這類誤差跨過門檻
+            raw[legacy] = np.round(values / weights[np.searchsorted(order, versions)] * 100, 4)
+    return raw
+
+def score(raw, version=CURRENT_RUBRIC_VERSION, criteria=None):
+    """ 以指定版本的權重算出每張選票的總分；未作答的指標不計，其餘權重依比例換算回滿分 """
+    weights = np.nan_to_num(_weight_vector(version, criteria or ALL_CRITERIA))
+    missing = np.isnan(raw)
+    partial = missing.any(axis=1)
+    if not partial.any():
+        return raw @ weights / 100
+    totals = np.where(missing, 0.0, raw) @ weights / 100
+    # 只有缺答的選票需要依實際作答的權重換算
+    possible = (~missing[partial]).astype(float) @ weights
+    with np.errstate(divide="ignore", invalid="ignore"):
+        totals[partial] = np.where(possible > 0, totals[partial] * weights.sum() / possible, np.nan)
+    return totals
+
+def achievement_rates(raw):
+    """ 各指標達成率 (%)：該指標原始分數的平均 (忽略未作答) """
+    counts = len(raw) - np.isnan(raw).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, np.nansum(raw, axis=0) / counts, np.nan)
+
+def rescore(df, version=CURRENT_RUBRIC_VERSION):
+    """ 整份選票依指定版本重新計分：回傳 (每張選票總分, {指標: 達成率 %}) """
+    criteria = get_rubric_columns(version)
+    raw = raw_matrix(df, criteria)
+    return score(raw, version, criteria), dict(zip(criteria, achievement_rates(raw).tolist()))
@@ -0,0 +1,116 @@
+import json
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# 欄式快照 (Parquet，pyarrow 為 streamlit 的相依套件)：
+#   <資料檔>.snapshot/manifest.json       目前的快照版本 (序號 + 每次壓實的唯一 id)、各段歷史檔與對應的 tail CSV inode
+#   <資料檔>.snapshot/history-<seq>.parquet 每次壓實時從 tail 搬進來的完整紀錄 (稽核用，只增不改)
+#   <資料檔>.snapshot/latest-<seq>.parquet  每位評審最後一張選票 + SYSTEM_INIT 列 (看板熱路徑只讀這份)
+MANIFEST = "manifest.json"
+COMPRESSION = "zstd"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def snapshot_dir(path):
+    return path + ".snapshot"
+
+
+def read_manifest(directory):
+    """ 讀取快照清單；尚未壓實過時回傳 None """
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(directory, manifest):
+    tmp_path = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+
+def _as_str(values):
+    """ 一律轉成字串 (缺值維持缺值)，避免同一欄混到 CSV 推斷出的數字 """
+    values = values.astype(object)
+    return values.where(values.isna(), values.astype(str))
+
+
+def to_datetime(values, fmt=TIMESTAMP_FORMAT):
+    """ 依固定格式解析時間；少數不符格式的舊資料才逐筆推斷，空白與無法解析的值為 NaT """
+    parsed = pd.to_datetime(values, format=fmt, errors="coerce")
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], format="mixed", errors="coerce")
+    return parsed
+
+
+def to_columnar(df, categorical, numeric, datetimes=()):
+    """ 轉成精簡型別：categorical 欄位用類別、numeric (已知的分數欄位) 用 float32、datetimes 欄位解析成時間，
+    其餘欄位 (意見與使用者自行加的欄位) 一律保留字串，不會被強制轉成數字而變成 NaN。
+    已經是目標型別的欄位原樣沿用，重複呼叫幾乎不花成本。 """
+    converted = {}
+    for col in df.columns:
+        values = df[col]
+        if col in categorical:
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                # 已經全是字串 (SQLite 的 TEXT 欄位) 直接轉類別，省掉逐筆轉字串
+                is_text = pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty")
+                converted[col] = (values if is_text else _as_str(values)).astype("category")
+        elif col in datetimes:
+            if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+                converted[col] = to_datetime(values)
+        elif col in numeric:
+            if values.dtype != "float32":
+                converted[col] = pd.to_numeric(values, errors="coerce").astype("float32")
+        elif not pd.api.types.is_string_dtype(values.dtype):
+            converted[col] = _as_str(values)
+    return df.assign(**converted) if converted else df
+
+
+def concat_columnar(frames):
+    """ 合併多段欄式資料：類別欄位先對齊成同一份類別清單 (只在後面追加新類別，既有代碼不變)，
+    pd.concat 才能直接接上代碼，不會退化成一般物件欄位 """
+    frames = [df for df in frames if df is not None]
+    if len(frames) == 1:
+        return frames[0]
+    for col in frames[0].columns:
+        if all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            categories = frames[0][col].cat.categories.append([df[col].cat.categories for df in frames[1:]]).unique()
+            frames = [df.assign(**{col: df[col].cat.set_categories(categories)}) for df in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_table(df, path):
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, engine="pyarrow", compression=COMPRESSION, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_table(path, columns=None, filters=None):
+    return pd.read_parquet(path, engine="pyarrow", columns=columns, filters=filters)
+
+
+def read_history(directory, manifest, columns=None, filters=None):
+    """ 依序讀回所有歷史段落；可只取部分欄位並以 filters 下推篩選 """
+    if not manifest or not manifest["parts"]:
+        return None
+    frames = []
+    for part in manifest["parts"]:
+        path = os.path.join(directory, part)
+        # 較早的段落可能還沒有後來新增的欄位，只讀該段實際存在的欄位
+        part_columns = None if columns is None else [col for col in columns if col in pq.read_schema(path).names]
+        frames.append(read_table(path, part_columns, filters))
+    return concat_columnar(frames)
+
+
+def iter_table(path, batch_size, filters=None):
+    """ 分批讀取一個快照檔 (每批最多 batch_size 列)，filters 格式同 read_table """
+    expression = pq.filters_to_expression(filters) if filters else None
+    for batch in ds.dataset(path, format="parquet").to_batches(filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
@@ -0,0 +1,795 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+import perf
+from rubric import ALL_CRITERIA, RUBRIC_VERSION_COL, VOTER_TYPE_COL, get_csv_columns
+from snapshot import (
+    snapshot_dir, read_manifest, write_manifest, to_columnar, concat_columnar,
+    write_table, read_table, read_history, iter_table, TIMESTAMP_FORMAT,
+)
+from vote_store import VoteStore
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只能退回行程內的鎖
+    fcntl = None
+
+UNKNOWN_VOTER_TYPE = "未分類"
+SYSTEM_VOTER = "SYSTEM_INIT"
+BALLOT_KEY = ["Voter", VOTER_TYPE_COL]
+CATALOG_COLS = ["Project", "Voter", VOTER_TYPE_COL, "Timestamp"]
+CATEGORICAL_COLS = ["Project", "Voter", VOTER_TYPE_COL]
+DATETIME_COLS = ["Timestamp"]
+# 已知的分數欄位：總分、評分版本與各版本的評核指標 (以 float32 讀入)
+SCORE_COLS = frozenset(["Total Score", RUBRIC_VERSION_COL, *ALL_CRITERIA])
+
+# 匯出時每次從儲存後端取出的列數
+EXPORT_CHUNK_ROWS = 50_000
+
+# 壓實進行中時快照清單與 tail CSV 可能短暫對不上，讀取端稍候重試
+SNAPSHOT_RETRIES = 50
+SNAPSHOT_RETRY_WAIT = 0.02
+
+# 舊版 page/Voting.py 寫入的檔案沒有 Project 欄位，遷移時歸到這個專案名稱下
+LEGACY_PROJECT = "舊版問卷"
+
+# Dashboard、評分頁與評分 API 共用的資料位置：
+# csv (預設，FILE_NAME) 或 sqlite (WAL 模式，先以 `python storage.py migrate` 匯入舊資料)
+FILE_NAME = "vote_data_v2.csv"
+LEGACY_FILE_NAME = "vote_data.csv"
+DB_NAME = os.environ.get("VOTE_DB", "vote_data.db")
+STORAGE_BACKEND = os.environ.get("VOTE_STORAGE", "csv")
+
+
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """ 以 `<path>.lock` 取得跨行程的建議性排他鎖 (advisory lock)，避免多個 session 同時寫入或改寫 """
+    with _process_locks_guard:
+        local_lock = _process_locks.setdefault(os.path.abspath(path), threading.Lock())
+    with local_lock, open(path + ".lock", "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_blank(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)) or value == ""
+
+
+# --- 型別化讀取：專案/評審/類別為 category、Timestamp 為時間、分數 float32，其餘欄位保留字串 ---
+def apply_dtypes(df):
+    """ 套用投票資料的明確型別；已是目標型別的欄位直接沿用 """
+    return to_columnar(df, CATEGORICAL_COLS, SCORE_COLS, DATETIME_COLS)
+
+
+def read_votes_csv(source, usecols=None):
+    """ 以明確型別解析投票 CSV (不讓 pandas 逐欄推斷成 object/float64)，usecols 可只讀部分欄位 """
+    dtype = defaultdict(lambda: str, {col: "category" for col in CATEGORICAL_COLS})
+    dtype.update({col: "float32" for col in SCORE_COLS})
+    try:
+        df = pd.read_csv(source, dtype=dtype, usecols=usecols)
+    except ValueError:
+        # 分數欄位混入非數字 (手動編輯過的舊檔)：退回推斷型別，再逐欄強制轉換
+        if hasattr(source, "seek"):
+            source.seek(0)
+        df = pd.read_csv(source, usecols=usecols)
+    return apply_dtypes(df)
+
+
+def _projection(columns, available=None, required=()):
+    """ 欄位投影：補上篩選時需要的欄位，並只留下 available 中存在的欄位；columns 為 None 表示全部 """
+    if columns is None:
+        return None
+    wanted = list(dict.fromkeys([*columns, *required]))
+    return wanted if available is None else [col for col in wanted if col in available]
+
+
+def normalize_voter_type(df):
+    """ 空白或缺漏的評審類別一律視為「未分類」 """
+    df = df.copy()
+    if VOTER_TYPE_COL not in df.columns:
+        df[VOTER_TYPE_COL] = UNKNOWN_VOTER_TYPE
+    col = df[VOTER_TYPE_COL]
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # 類別欄位直接調整類別清單，不必展開成一般物件
+        if "" in col.cat.categories:
+            col = col.cat.remove_categories([""])
+        if UNKNOWN_VOTER_TYPE not in col.cat.categories:
+            col = col.cat.add_categories([UNKNOWN_VOTER_TYPE])
+        df[VOTER_TYPE_COL] = col.fillna(UNKNOWN_VOTER_TYPE)
+    else:
+        df[VOTER_TYPE_COL] = col.fillna(UNKNOWN_VOTER_TYPE).replace("", UNKNOWN_VOTER_TYPE)
+    return df
+
+
+def latest_per_voter(df):
+    """ 每位評審 (姓名 + 類別) 只保留最後一次提交的評分；沒有時間的選票視為最早 (與 AggregateIndex 一致) """
+    return df.sort_values("Timestamp", kind="stable", na_position="first").drop_duplicates(subset=BALLOT_KEY, keep="last")
+
+
+# --- 1. 專案目錄 ---
+class ProjectCatalog:
+    """ 專案目錄：名稱、評審類別 (以 SYSTEM_INIT 列為準)、建立時間與選票數。
+    與資料一起寫入，source 記錄它對應的資料版本，對不上時由原始紀錄重建。 """
+
+    def __init__(self, source=None, entries=None):
+        self.source = source
+        self.entries = entries if entries is not None else {}
+
+    def copy(self):
+        return ProjectCatalog(self.source, {name: dict(entry) for name, entry in self.entries.items()})
+
+    def apply(self, projects, voters, voter_types, timestamps):
+        for project, voter, voter_type, ts in zip(projects, voters, voter_types, timestamps):
+            if is_blank(project):
+                continue
+            project = str(project)
+            voter_type = None if is_blank(voter_type) else str(voter_type)
+            ts = None if is_blank(ts) else str(ts)
+            entry = self.entries.get(project)
+            if entry is None:
+                entry = self.entries[project] = {"voter_type": None, "has_init": False, "created": ts, "ballots": 0}
+            if voter == SYSTEM_VOTER:
+                # 有 SYSTEM_INIT 列時，評審類別只看 SYSTEM_INIT 列
+                if not entry["has_init"]:
+                    entry.update(has_init=True, voter_type=voter_type, created=ts)
+                elif entry["voter_type"] is None:
+                    entry["voter_type"] = voter_type
+            else:
+                entry["ballots"] += 1
+                if not entry["has_init"] and entry["voter_type"] is None:
+                    entry["voter_type"] = voter_type
+
+    def apply_records(self, records):
+        self.apply(*([rec.get(col) for rec in records] for col in CATALOG_COLS))
+
+    def apply_frame(self, df):
+        self.apply(*(df[col].tolist() if col in df.columns else [None] * len(df) for col in CATALOG_COLS))
+
+    def projects(self):
+        return sorted(name for name in self.entries if name != SYSTEM_VOTER)
+
+    def project_type(self, project):
+        entry = self.entries.get(project)
+        if entry is None or entry["voter_type"] is None:
+            return UNKNOWN_VOTER_TYPE
+        return entry["voter_type"]
+
+    def to_json(self):
+        return json.dumps({"source": self.source, "projects": self.entries}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        source = data.get("source")
+        return cls(tuple(source) if source is not None else None, data.get("projects", {}))
+
+
+# --- 2. CSV 後端 (既有部署的預設值) ---
+class CsvStorage:
+    """ 單一 CSV 檔：上鎖後追加寫入，讀取交給 VoteStore 增量解析。
+    compact() 會把 CSV 併入 <path>.snapshot/ 的欄式快照，之後 CSV 只是一小段 tail。 """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.store = VoteStore(path, read_votes_csv)
+        self._schema_key = None
+        self._header_cols = None
+        self._catalog = None
+        self._reset_snapshot_caches()
+
+    def _reset_snapshot_caches(self):
+        self._manifest_cache = (None, None)
+        self._latest_cache = (None, None)
+        self._hot = (None, None)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def ensure_schema(self):
+        """ 確保 CSV 檔案存在且具備正確欄位；檔案沒變動時直接沿用上次的檢查結果 """
+        if self._schema_key is not None and self._schema_key == _file_key(self.path):
+            return
+        with file_lock(self.path):
+            self._recover_compaction()
+            self._ensure_schema()
+
+    def _ensure_schema(self):
+        """ 只讀表頭檢查欄位，欄位不符時才整份讀入並改寫 (須在鎖內呼叫) """
+        key = _file_key(self.path)
+        if key is not None and key == self._schema_key:
+            return
+        expected_cols = self.columns
+        if key is None or key[1] == 0:
+            # 經 _replace_tail 建立，已壓實過的快照清單才會認得新檔的 inode
+            self._replace_tail(lambda path: pd.DataFrame(columns=expected_cols).to_csv(path, index=False))
+            self._remember_schema(expected_cols)
+            return
+
+        header = pd.read_csv(self.path, nrows=0).columns.tolist()
+        if header[:len(expected_cols)] == expected_cols:
+            self._remember_schema(header)
+            return
+
+        df = pd.read_csv(self.path)
+        if VOTER_TYPE_COL not in df.columns:
+            df[VOTER_TYPE_COL] = UNKNOWN_VOTER_TYPE
+        for col in expected_cols:
+            if col not in df.columns:
+                df[col] = ""
+        extra_cols = [col for col in df.columns if col not in expected_cols]
+        df = df.reindex(columns=expected_cols + extra_cols)
+        df[VOTER_TYPE_COL] = df[VOTER_TYPE_COL].fillna(UNKNOWN_VOTER_TYPE).replace("", UNKNOWN_VOTER_TYPE)
+        self._replace_tail(lambda path: df.to_csv(path, index=False))
+        self._remember_schema(df.columns.tolist())
+
+    def _replace_tail(self, write, manifest=None):
+        """ 先寫新檔再替換，讀取端永遠不會看到寫到一半的檔案 (須在鎖內呼叫)。
+        有快照時先把新檔的 inode 記進清單，讀取端才會把新 tail 與快照視為一組。 """
+        next_path = self.path + ".next"
+        write(next_path)
+        directory = snapshot_dir(self.path)
+        manifest = manifest if manifest is not None else read_manifest(directory)
+        if manifest is not None:
+            write_manifest(directory, dict(manifest, tail_ino=os.stat(next_path).st_ino))
+        os.replace(next_path, self.path)
+
+    def _remember_schema(self, header):
+        self._header_cols = header
+        self._schema_key = _file_key(self.path)
+
+    def append(self, records):
+        """ 一批選票在同一把鎖內以單次 write 追加，不會與其他寫入交錯 """
+        with file_lock(self.path):
+            self._recover_compaction()
+            self._ensure_schema()
+            self._load_catalog(_file_key(self.path))
+            data = pd.DataFrame(records).reindex(columns=self._header_cols).to_csv(index=False, header=False)
+            with open(self.path, "a", encoding="utf-8", newline="") as f:
+                f.write(data)
+            # 自己追加的內容不影響表頭，更新快取鍵值即可
+            self._schema_key = _file_key(self.path)
+            catalog = self._catalog.copy()
+            catalog.apply_records(records)
+            catalog.source = self._schema_key
+            self._save_catalog(catalog)
+
+    def _catalog_path(self):
+        return self.path + ".catalog.json"
+
+    def _load_catalog(self, key):
+        """ 讀取與資料檔 key 相符的專案目錄，過期或不存在時重建 (須在鎖內呼叫) """
+        if self._catalog is not None and self._catalog.source == key:
+            return
+        try:
+            with open(self._catalog_path(), encoding="utf-8") as f:
+                catalog = ProjectCatalog.from_json(f.read())
+        except (FileNotFoundError, ValueError):
+            catalog = None
+        if catalog is None or catalog.source != key:
+            catalog = ProjectCatalog(key)
+            if key is not None:
+                history = read_history(snapshot_dir(self.path), read_manifest(snapshot_dir(self.path)), columns=CATALOG_COLS)
+                if history is not None:
+                    catalog.apply_frame(history)
+                catalog.apply_frame(read_votes_csv(self.path, usecols=lambda c: c in CATALOG_COLS))
+                self._save_catalog(catalog)
+        self._catalog = catalog
+
+    def _save_catalog(self, catalog):
+        tmp_path = self._catalog_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(catalog.to_json())
+        os.replace(tmp_path, self._catalog_path())
+        self._catalog = catalog
+
+    def catalog(self):
+        """ 與資料檔同步的專案目錄；資料沒變動時只需一次 stat """
+        catalog = self._catalog
+        if catalog is None or catalog.source != _file_key(self.path):
+            with file_lock(self.path):
+                self._load_catalog(_file_key(self.path))
+            catalog = self._catalog
+        return catalog
+
+    def _manifest(self):
+        """ 快照清單，以檔案 key 快取 (沒有壓實過時為 None) """
+        path = os.path.join(snapshot_dir(self.path), "manifest.json")
+        key = _file_key(path)
+        if key != self._manifest_cache[0]:
+            self._manifest_cache = (key, read_manifest(snapshot_dir(self.path)) if key is not None else None)
+        return self._manifest_cache[1]
+
+    def _latest_frame(self, manifest):
+        """ 快照中每位評審最後一張選票 (欄式型別)，同一個快照序號只讀一次 """
+        if manifest is None:
+            return None
+        if self._latest_cache[0] != _snapshot_key(manifest):
+            with perf.timed("snapshot.latest") as t:
+                df = apply_dtypes(read_table(os.path.join(snapshot_dir(self.path), manifest["latest"])))
+                t["rows"] = len(df)
+            self._latest_cache = (_snapshot_key(manifest), df)
+        return self._latest_cache[1]
+
+    def _read_consistent(self, read_tail):
+        """ 讀取互相對應的 (快照清單, 最新選票快照, tail)：清單前後沒變，且清單記錄的 tail inode 就是剛讀的 CSV """
+        for _ in range(SNAPSHOT_RETRIES):
+            manifest = self._manifest()
+            try:
+                latest = self._latest_frame(manifest)
+            except FileNotFoundError:
+                time.sleep(SNAPSHOT_RETRY_WAIT)
+                continue
+            tail = read_tail()
+            inode = self.store.inode
+            if self._manifest() is manifest and (manifest is None or inode is None or manifest["tail_ino"] == inode):
+                return manifest, latest, tail
+            time.sleep(SNAPSHOT_RETRY_WAIT)
+        # 一直對不上代表壓實在中途中斷：在鎖內補完後再讀
+        with file_lock(self.path):
+            self._recover_compaction()
+            self._adopt_tail()
+        manifest = self._manifest()
+        return manifest, self._latest_frame(manifest), read_tail()
+
+    def _with_snapshot(self, latest, tail):
+        if latest is None:
+            return tail
+        if tail.empty:
+            return latest
+        return concat_columnar([latest, apply_dtypes(tail)])
+
+    def load(self, columns=None):
+        """ 看板熱路徑：快照中每位評審最後一張選票 + tail 新追加的列 (沒有快照時即整份 CSV)；
+        columns 只取部分欄位 (呼叫端請勿就地修改回傳的 DataFrame) """
+        manifest, latest, tail = self._read_consistent(self.store.refresh)
+        key = (_snapshot_key(manifest), self.store.version)
+        if self._hot[0] != key:
+            self._hot = (key, self._with_snapshot(latest, tail))
+        df = self._hot[1]
+        return df if columns is None else df[_projection(columns, df.columns)]
+
+    def load_history(self, project=None, columns=None):
+        """ 完整紀錄 (稽核用)：所有歷史快照段 + tail；指定專案時篩選條件下推到 Parquet，只讀該專案與 columns 欄位 """
+        manifest, _, tail = self._read_consistent(self.store.refresh)
+        filters = [("Project", "==", project)] if project is not None else None
+        history = read_history(snapshot_dir(self.path), manifest, _projection(columns, tail.columns), filters)
+        if project is not None and "Project" in tail.columns:
+            tail = tail[tail["Project"] == project]
+        if columns is not None:
+            tail = tail[_projection(columns, tail.columns)]
+        if history is None:
+            return tail
+        history = apply_dtypes(history)
+        return concat_columnar([history, tail]) if not tail.empty else history
+
+    def iter_history(self, project=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """ 逐段產生完整紀錄 (各歷史快照段 + tail)，欄位一律對齊 tail 表頭；匯出時不必組成一整個 DataFrame """
+        manifest, _, tail = self._read_consistent(self.store.refresh)
+        columns = tail.columns.tolist()
+        filters = [("Project", "==", project)] if project is not None else None
+        for part in (manifest or {}).get("parts", []):
+            for chunk in iter_table(os.path.join(snapshot_dir(self.path), part), chunk_rows, filters):
+                chunk = apply_dtypes(chunk)
+                yield chunk.reindex(columns=columns) if columns else chunk
+        if project is not None and "Project" in tail.columns:
+            tail = tail[tail["Project"] == project]
+        for start in range(0, max(len(tail), 1), chunk_rows):
+            yield tail.iloc[start:start + chunk_rows]
+
+    def version(self):
+        """ 資料版本 (一次 stat)：任何寫入、改寫、壓實或刪除都會讓它改變 """
+        return _file_key(self.path)
+
+    def changes(self, cursor):
+        """ 增量變更：回傳 (新列, 新 cursor, 是否需從頭重建)；cursor 為 (快照識別, tail cursor) """
+        tail_cursor = cursor[1] if cursor is not None else None
+        manifest, latest, (rows, tail_cursor, reset) = self._read_consistent(lambda: self.store.changes(tail_cursor))
+        snapshot = _snapshot_key(manifest)
+        if cursor is None or cursor[0] != snapshot or reset:
+            if not reset:
+                rows, tail_cursor, _ = self.store.changes(None)
+            return self._with_snapshot(latest, rows), (snapshot, tail_cursor), True
+        return rows, (snapshot, tail_cursor), False
+
+    def load_project(self, project, columns=None):
+        """ 單一專案的完整紀錄 (不含 SYSTEM_INIT 列)；columns 只讀看板該區塊要顯示的欄位 """
+        df = self.load_history(project, _projection(columns, required=["Voter"]))
+        if df.empty:
+            return df
+        df = normalize_voter_type(df[df["Voter"] != SYSTEM_VOTER])
+        return df if columns is None else df[_projection(columns, df.columns)]
+
+    def latest_ballots(self, project):
+        df = self.load()
+        if df.empty:
+            return df
+        return latest_per_voter(normalize_voter_type(df[(df["Project"] == project) & (df["Voter"] != SYSTEM_VOTER)]))
+
+    def compact(self):
+        """ 壓實：把 tail CSV 的完整紀錄追加成一段歷史快照，重算每位評審最後一張選票，CSV 只留下表頭。
+        回傳併入快照的列數。 """
+        with file_lock(self.path):
+            self._recover_compaction()
+            key = _file_key(self.path)
+            if key is None:
+                return 0
+            self._load_catalog(key)
+            tail = read_votes_csv(self.path)
+            if tail.empty:
+                return 0
+            directory = snapshot_dir(self.path)
+            os.makedirs(directory, exist_ok=True)
+            manifest = read_manifest(directory) or {"seq": 0, "parts": [], "latest": None}
+            seq = manifest["seq"] + 1
+            part, latest = f"history-{seq:06d}.parquet", f"latest-{seq:06d}.parquet"
+            previous = apply_dtypes(read_table(os.path.join(directory, manifest["latest"]))) if manifest["latest"] else None
+            write_table(tail, os.path.join(directory, part))
+            write_table(apply_dtypes(_fold_latest(previous, tail)), os.path.join(directory, latest))
+
+            # 清單記下新 tail 的 inode 之後才替換 CSV；中途中斷時由 _recover_compaction 補完
+            self._replace_tail(
+                lambda path: pd.DataFrame(columns=tail.columns).to_csv(path, index=False),
+                {"seq": seq, "id": uuid.uuid4().hex, "parts": manifest["parts"] + [part], "latest": latest,
+                 "rows": manifest.get("rows", 0) + len(tail)},
+            )
+            if manifest["latest"]:
+                os.remove(os.path.join(directory, manifest["latest"]))
+
+            self._remember_schema(tail.columns.tolist())
+            catalog = self._catalog.copy()
+            catalog.source = self._schema_key
+            self._save_catalog(catalog)
+            return len(tail)
+
+    def _adopt_tail(self):
+        """ 沒有壓實可補完、清單卻仍對不上 CSV (例如 CSV 在鎖外被刪除重建)：讓清單改認目前的 tail (須在鎖內呼叫) """
+        directory = snapshot_dir(self.path)
+        manifest = read_manifest(directory)
+        if manifest is None or not os.path.exists(self.path):
+            return
+        inode = os.stat(self.path).st_ino
+        if manifest["tail_ino"] != inode:
+            write_manifest(directory, dict(manifest, tail_ino=inode))
+
+    def _recover_compaction(self):
+        """ 壓實或改寫在寫入清單後、替換 CSV 前中斷時補上替換；清單還沒寫入則丟棄半成品 (須在鎖內呼叫) """
+        next_path = self.path + ".next"
+        if not os.path.exists(next_path):
+            return
+        manifest = read_manifest(snapshot_dir(self.path))
+        if manifest is not None and manifest["tail_ino"] == os.stat(next_path).st_ino:
+            os.replace(next_path, self.path)
+        else:
+            os.remove(next_path)
+
+    def projects(self):
+        return self.catalog().projects()
+
+    def project_type(self, project):
+        return self.catalog().project_type(project)
+
+    def clear(self):
+        with file_lock(self.path):
+            for path in (self.path, self._catalog_path(), self.path + ".next"):
+                if os.path.exists(path):
+                    os.remove(path)
+            shutil.rmtree(snapshot_dir(self.path), ignore_errors=True)
+            self._catalog = None
+            self._reset_snapshot_caches()
+
+
+# --- 3. SQLite 後端 (WAL 模式 + 索引) ---
+class SqliteStorage:
+    """ SQLite 資料庫：每個執行緒一條連線，WAL 模式讓看板讀取不會卡住投票寫入 """
+
+    TABLE = "votes"
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._local = threading.local()
+        self._ready = False
+        self._catalog = None
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _select_cols(self, columns=None):
+        return ", ".join(_quote(c) for c in (self.columns if columns is None else _projection(columns, self.columns)))
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def ensure_schema(self):
+        """ 建立資料表與索引；評核指標有新增時補上欄位 """
+        if self._ready:
+            return
+        conn = self._conn()
+        with conn:
+            col_defs = ", ".join(f"{_quote(c)} {_sql_type(c)}" for c in self.columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} (id INTEGER PRIMARY KEY AUTOINCREMENT, {col_defs})")
+            existing = {row[1] for row in conn.execute(f"PRAGMA table_info({self.TABLE})")}
+            for col in self.columns:
+                if col not in existing:
+                    conn.execute(f"ALTER TABLE {self.TABLE} ADD COLUMN {_quote(col)} {_sql_type(col)}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_votes_ballot ON {self.TABLE} (Project, Voter, {_quote(VOTER_TYPE_COL)}, Timestamp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._ready = True
+
+    def _insert(self, conn, records):
+        placeholders = ", ".join("?" for _ in self.columns)
+        rows = [tuple(_sql_value(rec.get(c)) for c in self.columns) for rec in records]
+        conn.executemany(f"INSERT INTO {self.TABLE} ({self._select_cols()}) VALUES ({placeholders})", rows)
+
+    def append(self, records):
+        self.ensure_schema()
+        conn = self._conn()
+        with conn:
+            # 先取得寫入鎖，專案目錄與選票在同一個交易內更新
+            conn.execute("BEGIN IMMEDIATE")
+            catalog = self._load_catalog(conn).copy()
+            self._insert(conn, records)
+            catalog.apply_records(records)
+            catalog.source = self._catalog_source(conn)
+            self._save_catalog(conn, catalog)
+
+    def _catalog_source(self, conn):
+        max_id = conn.execute(f"SELECT MAX(id) FROM {self.TABLE}").fetchone()[0]
+        return (self._generation(), max_id or 0)
+
+    def _load_catalog(self, conn):
+        """ 讀取 meta 表中的專案目錄，與目前的 (generation, 最大 id) 對不上時重建 """
+        source = self._catalog_source(conn)
+        catalog = self._catalog
+        if catalog is not None and catalog.source == source:
+            return catalog
+        row = conn.execute("SELECT value FROM meta WHERE key = 'catalog'").fetchone()
+        catalog = ProjectCatalog.from_json(row[0]) if row else None
+        if catalog is None or catalog.source != source:
+            catalog = ProjectCatalog(source)
+            cols = ", ".join(_quote(c) for c in CATALOG_COLS)
+            catalog.apply_frame(pd.read_sql_query(f"SELECT {cols} FROM {self.TABLE} ORDER BY id", conn))
+            self._save_catalog(conn, catalog)
+        self._catalog = catalog
+        return catalog
+
+    def _save_catalog(self, conn, catalog):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('catalog', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (catalog.to_json(),),
+        )
+        self._catalog = catalog
+
+    def catalog(self):
+        self.ensure_schema()
+        conn = self._conn()
+        with conn:
+            return self._load_catalog(conn)
+
+    def _query(self, sql, params=()):
+        self.ensure_schema()
+        return apply_dtypes(pd.read_sql_query(sql, self._conn(), params=params))
+
+    def load(self, columns=None):
+        """ 全部紀錄；columns 只 SELECT 需要的欄位 """
+        return self._query(f"SELECT {self._select_cols(columns)} FROM {self.TABLE} ORDER BY id")
+
+    def _generation(self):
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def version(self):
+        """ 資料版本：(generation, 最大 id)，走主鍵索引，新增或清空都會讓它改變 """
+        self.ensure_schema()
+        return self._catalog_source(self._conn())
+
+    def changes(self, cursor):
+        """ 增量變更：以自動遞增 id 為 cursor，清空資料時 generation 會改變 """
+        self.ensure_schema()
+        generation = self._generation()
+        reset = cursor is None or cursor[0] != generation
+        last_id = 0 if reset else cursor[1]
+        df = pd.read_sql_query(
+            f"SELECT id, {self._select_cols()} FROM {self.TABLE} WHERE id > ? ORDER BY id",
+            self._conn(), params=(last_id,),
+        )
+        if df.empty:
+            # 看板輪詢多半沒有新列，只有真的讀到新選票才轉型
+            return df.drop(columns="id"), (generation, last_id), reset
+        last_id = int(df["id"].iloc[-1])
+        return apply_dtypes(df.drop(columns="id")), (generation, last_id), reset
+
+    def iter_history(self, project=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        """ 以 chunksize 分段讀出完整紀錄，指定專案時走 Project 索引 """
+        self.ensure_schema()
+        where, params = ("WHERE Project = ?", (project,)) if project is not None else ("", ())
+        for chunk in pd.read_sql_query(
+            f"SELECT {self._select_cols()} FROM {self.TABLE} {where} ORDER BY id",
+            self._conn(), params=params, chunksize=chunk_rows,
+        ):
+            yield apply_dtypes(chunk)
+
+    def load_project(self, project, columns=None):
+        """ 單一專案的完整紀錄 (不含 SYSTEM_INIT 列)，篩選與欄位投影都交給 SQL """
+        df = self._query(
+            f"SELECT {self._select_cols(columns)} FROM {self.TABLE} WHERE Project = ? AND Voter != ? ORDER BY id",
+            (project, SYSTEM_VOTER),
+        )
+        df = normalize_voter_type(df)
+        return df if columns is None else df[_projection(columns, df.columns)]
+
+    def latest_ballots(self, project):
+        """ 以 (Project, Voter, Voter Type, Timestamp) 索引直接取出每位評審最後一張選票 """
+        vt = f"COALESCE(NULLIF({_quote(VOTER_TYPE_COL)}, ''), ?)"
+        df = self._query(
+            f"SELECT {self._select_cols()} FROM ("
+            f" SELECT *, ROW_NUMBER() OVER (PARTITION BY Voter, {vt} ORDER BY Timestamp DESC, id DESC) AS rn"
+            f" FROM {self.TABLE} WHERE Project = ? AND Voter != ?"
+            f") WHERE rn = 1 ORDER BY Timestamp, id",
+            (UNKNOWN_VOTER_TYPE, project, SYSTEM_VOTER),
+        )
+        return normalize_voter_type(df)
+
+    def projects(self):
+        return self.catalog().projects()
+
+    def project_type(self, project):
+        return self.catalog().project_type(project)
+
+    def clear(self):
+        self.ensure_schema()
+        conn = self._conn()
+        with conn:
+            conn.execute(f"DELETE FROM {self.TABLE}")
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('generation', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (str(self._generation() + 1),),
+            )
+
+    def import_csv(self, csv_path, default_project=None):
+        """ 把一份 CSV 匯入資料庫；同一路徑只會匯入一次，回傳匯入筆數 """
+        self.ensure_schema()
+        conn = self._conn()
+        key = f"migrated:{os.path.abspath(csv_path)}"
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return 0
+        df = CsvStorage(csv_path, None).load_history()
+        if "Project" not in df.columns:
+            df["Project"] = default_project or LEGACY_PROJECT
+        df = normalize_voter_type(df)
+        records = df.reindex(columns=self.columns).to_dict("records")
+        with conn:
+            self._insert(conn, records)
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, str(len(records))))
+        return len(records)
+
+
+def _fold_latest(previous, tail):
+    """ 上一版最新選票 + 新的 tail → 每位評審 (專案 + 姓名 + 類別) 最後一張選票，SYSTEM_INIT 列全部保留 """
+    df = tail if previous is None else concat_columnar([previous, tail])
+    init = df["Voter"] == SYSTEM_VOTER
+    ballots = normalize_voter_type(df[~init])
+    ballots = ballots.sort_values("Timestamp", kind="stable", na_position="first").drop_duplicates(subset=["Project"] + BALLOT_KEY, keep="last")
+    merged = concat_columnar([df[init], ballots])
+    merged.index = df.index[init].append(ballots.index)
+    return merged.sort_index()
+
+
+def _snapshot_key(manifest):
+    """ 快照的識別：序號在清空後會從 1 重來，另以每次壓實產生的唯一 id 區分 (其他行程的實例也能察覺換過) """
+    if manifest is None:
+        return None
+    return (manifest.get("id"), manifest["seq"], manifest["latest"])
+
+
+def _file_key(path):
+    """ 以 (inode, 大小, 修改時間) 判斷檔案是否變動；檔案不存在時回傳 None """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_type(col):
+    return "REAL" if col in SCORE_COLS else "TEXT"
+
+
+def _sql_value(value):
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime(TIMESTAMP_FORMAT)
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value.item() if hasattr(value, "item") else value
+
+
+STORAGE_BACKENDS = {"csv": CsvStorage, "sqlite": SqliteStorage}
+
+
+def open_storage(kind, path, columns):
+    """ 依設定建立儲存後端：csv (預設) 或 sqlite """
+    if kind not in STORAGE_BACKENDS:
+        raise ValueError(f"未知的儲存後端：{kind} (可用：{', '.join(STORAGE_BACKENDS)})")
+    return STORAGE_BACKENDS[kind](path, columns)
+
+
+def default_path(backend=STORAGE_BACKEND):
+    return DB_NAME if backend == "sqlite" else FILE_NAME
+
+
+def open_default_storage(backend=None, path=None):
+    """ 依 VOTE_STORAGE / VOTE_DB 開啟應用程式的儲存後端 (欄位為目前評分版本的 CSV 欄位) """
+    backend = backend or STORAGE_BACKEND
+    return open_storage(backend, path or default_path(backend), get_csv_columns())
+
+
+# --- 4. 一次性遷移：CSV → SQLite ---
+def migrate_csv_to_sqlite(db_path, csv_paths, legacy_project=LEGACY_PROJECT):
+    """ 將 vote_data_v2.csv 與舊版 vote_data.csv 匯入 SQLite；欄位以所有來源表頭的聯集為準 """
+    sources = [p for p in csv_paths if os.path.exists(p)]
+    columns = []
+    for path in sources:
+        for col in pd.read_csv(path, nrows=0).columns:
+            if col not in columns:
+                columns.append(col)
+    base = ["Project", "Voter", VOTER_TYPE_COL, "Timestamp", "Total Score", "Feedback"]
+    columns = base + [c for c in columns if c not in base]
+    db = SqliteStorage(db_path, columns)
+    return {path: db.import_csv(path, legacy_project) for path in sources}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="投票資料儲存工具")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate", help="將既有 CSV 匯入 SQLite 資料庫")
+    mig.add_argument("--db", default=DB_NAME)
+    mig.add_argument("--legacy-project", default=LEGACY_PROJECT)
+    mig.add_argument("csv", nargs="*", default=[FILE_NAME, LEGACY_FILE_NAME])
+    comp = sub.add_parser("compact", help="把 CSV 併入欄式快照 (完整紀錄保留在 <csv>.snapshot/)，CSV 只留表頭")
+    comp.add_argument("csv", nargs="?", default=FILE_NAME)
+    args = parser.parse_args()
+    if args.cmd == "migrate":
+        for path, count in migrate_csv_to_sqlite(args.db, args.csv, args.legacy_project).items():
+            print(f"{path}: 匯入 {count} 筆")
+    elif args.cmd == "compact":
+        print(f"{args.csv}: 併入快照 {CsvStorage(args.csv, None).compact()} 筆")
+
+
+if __name__ == "__main__":
+    main()
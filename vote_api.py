@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import html
+import json
+import math
+import os
+import time
+import urllib.parse
+from datetime import datetime
+
+import perf
+from ingest import GroupCommitWriter
+from rubric import RUBRIC, RUBRIC_CONTENT, RUBRIC_VERSION_COL, CURRENT_RUBRIC_VERSION, rubric_weights, weighted_total
+from storage import VOTER_TYPE_COL, SYSTEM_VOTER, FILE_NAME, DB_NAME, STORAGE_BACKEND, default_path, open_default_storage
+
+# 輕量的評分 API (只用標準函式庫)：手機送一張選票不必維持整條 Streamlit websocket session。
+# 寫入與 Dashboard 的 append_record 相同 (GroupCommitWriter → 儲存後端)，可與 Streamlit 同時運行。
+# 看板 QR Code 的連結 (/?page=vote&project=...) 也能直接開啟這裡的表單：把 VOTE_BASE_URL 設成本服務的網址即可。
+API_PORT = int(os.environ.get("VOTE_API_PORT", "8502"))
+
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_LINES = 100
+MAX_TEXT_LEN = {"project": 200, "voter": 100, "feedback": 2000}
+IDLE_TIMEOUT = 60
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+               431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class BallotError(ValueError):
+    pass
+
+
+def validate_ballot(payload):
+    """ 依目前評分版本檢查選票，回傳 (專案, 姓名, 回饋, {指標: 0~100 原始分數})；不合格時拋出 BallotError """
+    if not isinstance(payload, dict):
+        raise BallotError("選票格式錯誤")
+    texts = {}
+    for field, limit in MAX_TEXT_LEN.items():
+        value = payload.get(field, "")
+        if not isinstance(value, str):
+            raise BallotError(f"{field} 必須是字串")
+        value = value.strip()
+        if len(value) > limit:
+            raise BallotError(f"{field} 超過 {limit} 字")
+        texts[field] = value
+    if not texts["project"]:
+        raise BallotError("缺少專案名稱")
+    if not texts["voter"] or texts["voter"] == SYSTEM_VOTER:
+        raise BallotError("請輸入姓名以供系統核對")
+
+    scores = payload.get("scores")
+    if not isinstance(scores, dict):
+        raise BallotError("缺少評分")
+    expected = rubric_weights()
+    unknown = [name for name in scores if name not in expected]
+    missing = [name for name in expected if name not in scores]
+    if unknown or missing:
+        raise BallotError(f"評分項目與第 {CURRENT_RUBRIC_VERSION} 版評核指標不符 (缺少 {len(missing)} 項、多出 {len(unknown)} 項)")
+    raw = {}
+    for name, value in scores.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise BallotError(f"「{name}」的分數必須介於 0~100")
+        try:
+            # JSON 允許任意長度的整數，轉 float 可能溢位
+            value = float(value)
+        except OverflowError:
+            raise BallotError(f"「{name}」的分數必須介於 0~100") from None
+        if math.isnan(value) or not 0 <= value <= 100:
+            raise BallotError(f"「{name}」的分數必須介於 0~100")
+        raw[name] = value
+    return texts["project"], texts["voter"], texts["feedback"], raw
+
+
+def _form_html():
+    """ 靜態評分表單：滑桿依 RUBRIC 產生，專案名稱取自網址 ?project= """
+    sections = []
+    for cat, items in RUBRIC.items():
+        rows = "".join(
+            f'<label title="{html.escape(RUBRIC_CONTENT.get(name, ""))}">{html.escape(name)} <small>({weight}分)</small>'
+            f'<input type="range" min="0" max="100" step="5" value="70" data-name="{html.escape(name)}" data-weight="{weight}">'
+            f'<output>70</output></label>'
+            for name, weight in items
+        )
+        sections.append(f"<h3>{html.escape(cat)}</h3>{rows}")
+    return f"""<!doctype html>
+<html lang="zh-Hant"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>新光醫院 AI 軟體評定</title>
+<style>
+body{{font-family:sans-serif;max-width:640px;margin:auto;padding:12px}} label{{display:block;margin:14px 0}}
+input[type=range]{{width:85%}} input[type=text],textarea{{width:100%;font-size:16px;padding:6px;box-sizing:border-box}}
+#total{{font-size:48px;font-weight:bold}} button{{width:100%;font-size:20px;padding:12px;margin-top:12px}}
+</style></head><body>
+<h2>📝 正在評估專案：<span id="project"></span></h2>
+<label>您的姓名 (評審)<input type="text" id="voter" maxlength="{MAX_TEXT_LEN["voter"]}" placeholder="此姓名僅供內部核對"></label>
+{"".join(sections)}
+<p style="text-align:center">目前總計分數：<span id="total"></span></p>
+<label>💬 建議與回饋 (將匿名顯示在大螢幕)<textarea id="feedback" rows="3" maxlength="{MAX_TEXT_LEN["feedback"]}"></textarea></label>
+<button id="submit">🚀 確認提交評分</button>
+<p id="result"></p>
+<script>
+const project = new URLSearchParams(location.search).get("project") || "";
+document.getElementById("project").textContent = project || "(未偵測到專案名稱)";
+const sliders = [...document.querySelectorAll("input[type=range]")];
+function update() {{
+  let total = 0;
+  for (const s of sliders) {{ s.nextElementSibling.value = s.value; total += s.value / 100 * s.dataset.weight; }}
+  const el = document.getElementById("total");
+  el.textContent = total.toFixed(1);
+  el.style.color = total >= 75 ? "green" : total >= 60 ? "orange" : "red";
+}}
+sliders.forEach(s => s.addEventListener("input", update)); update();
+document.getElementById("submit").addEventListener("click", async () => {{
+  const result = document.getElementById("result");
+  const scores = Object.fromEntries(sliders.map(s => [s.dataset.name, Number(s.value)]));
+  const body = {{project, voter: document.getElementById("voter").value, feedback: document.getElementById("feedback").value, scores}};
+  const res = await fetch("/api/ballot", {{method: "POST", headers: {{"Content-Type": "application/json"}}, body: JSON.stringify(body)}});
+  const data = await res.json();
+  result.textContent = res.ok ? `✅ 提交成功！感謝您的評分。(寫入耗時 ${{data.latency_ms.toFixed(0)}} ms)` : `❌ ${{data.error}}`;
+}});
+</script></body></html>""".encode("utf-8")
+
+
+class VoteApi:
+    """ asyncio HTTP 伺服器：GET / 評分表單、POST /api/ballot 寫入選票、GET /api/stats 連線數與記憶體 """
+
+    def __init__(self, storage, writer=None):
+        self.storage = storage
+        self.writer = writer or GroupCommitWriter(storage)
+        self.form = _form_html()
+        self.connections = 0
+        self.peak_connections = 0
+        self.requests = 0
+        self.ballots = 0
+        self.started = time.time()
+        self.baseline_rss = perf.rss_bytes()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        self.peak_connections = max(self.peak_connections, self.connections)
+        try:
+            while await self._serve_one(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _read_line(self, reader):
+        """ 讀一行；超過 StreamReader 的長度上限 (64 KB) 時回傳 None """
+        try:
+            return await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+        except (ValueError, asyncio.LimitOverrunError):
+            return None
+
+    async def _serve_one(self, reader, writer):
+        """ 處理一個請求 (支援 keep-alive)；回傳是否繼續讀同一條連線 """
+        request_line = await self._read_line(reader)
+        if request_line == b"":
+            return False
+        try:
+            method, target, version = (request_line or b"").decode("latin-1").split()
+        except ValueError:
+            await self._respond(writer, 400, {"error": "bad request line"}, keep_alive=False)
+            return False
+        headers = {}
+        for _ in range(MAX_HEADER_LINES + 1):
+            line = await self._read_line(reader)
+            if line is None:
+                break
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        else:
+            line = None
+        if line is None:
+            await self._respond(writer, 431, {"error": "headers too large"}, keep_alive=False)
+            return False
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_BODY_BYTES:
+            await self._respond(writer, 413, {"error": "body too large"}, keep_alive=False)
+            return False
+        body = await reader.readexactly(length) if length else b""
+
+        self.requests += 1
+        status, payload = await self._route(method, target, body)
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _route(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        if url.path in ("/", "/vote"):
+            return (200, self.form) if method == "GET" else (405, {"error": "method not allowed"})
+        if url.path == "/api/ballot":
+            return await self._post_ballot(body) if method == "POST" else (405, {"error": "method not allowed"})
+        if url.path == "/api/rubric" and method == "GET":
+            return 200, {"version": CURRENT_RUBRIC_VERSION, "rubric": RUBRIC}
+        if url.path == "/api/stats" and method == "GET":
+            return 200, self.stats()
+        if url.path == "/healthz":
+            return 200, {"ok": True}
+        return 404, {"error": "not found"}
+
+    async def _post_ballot(self, body):
+        try:
+            project, voter, feedback, raw = validate_ballot(json.loads(body or b"null"))
+        except (BallotError, ValueError, RecursionError) as e:
+            # RecursionError：巢狀過深的 JSON (例如數萬個 "[")
+            return 400, {"error": str(e) if isinstance(e, BallotError) else "JSON 格式錯誤"}
+        loop = asyncio.get_running_loop()
+        try:
+            # 專案類別與 Streamlit 投票頁相同，以專案目錄 (SYSTEM_INIT 列) 為準；查詢可能需要檔案鎖，交給執行緒
+            voter_type = await loop.run_in_executor(None, self.storage.project_type, project)
+            record = {
+                "Project": project, "Voter": voter, VOTER_TYPE_COL: voter_type,
+                "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "Total Score": weighted_total(raw), "Feedback": feedback, RUBRIC_VERSION_COL: CURRENT_RUBRIC_VERSION,
+            }
+            record.update(raw)
+            latency = await asyncio.wrap_future(self.writer.submit_future(record))
+        except Exception as e:
+            return 500, {"error": f"寫入失敗：{e}"}
+        self.ballots += 1
+        return 200, {"ok": True, "total": record["Total Score"], "latency_ms": latency * 1000}
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        if isinstance(payload, bytes):
+            body, content_type = payload, "text/html; charset=utf-8"
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    def stats(self):
+        """ 連線數、選票數、寫入延遲與記憶體 (RSS)；per_connection_kb 為目前 RSS 增量平均到尖峰連線數 """
+        rss = perf.rss_bytes()
+        return {
+            "connections": self.connections, "peak_connections": self.peak_connections,
+            "requests": self.requests, "ballots": self.ballots, "uptime_s": time.time() - self.started,
+            "rss_mb": rss / 2**20, "baseline_rss_mb": self.baseline_rss / 2**20,
+            "per_connection_kb": (rss - self.baseline_rss) / 1024 / self.peak_connections if self.peak_connections else 0.0,
+            "ingest": self.writer.stats(),
+        }
+
+
+async def serve(api, host, port):
+    server = await asyncio.start_server(api.handle, host, port, backlog=1024)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="輕量評分 API (與 Streamlit 看板共用儲存後端)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=STORAGE_BACKEND)
+    parser.add_argument("--path", help=f"資料檔路徑 (預設 csv：{FILE_NAME}，sqlite：{DB_NAME})")
+    args = parser.parse_args()
+    path = args.path or default_path(args.backend)
+    storage = open_default_storage(args.backend, path)
+    storage.ensure_schema()
+    print(f"評分 API：http://{args.host}:{args.port}/?project=<專案名稱> ({args.backend}: {path})", flush=True)
+    try:
+        asyncio.run(serve(VoteApi(storage), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import io
+import os
+import threading
+
+import pandas as pd
+
+import perf
+from snapshot import concat_columnar
+
+# 比對檔案是否被改寫時，檢查上次讀取位置之前的這段位元組
+SIGNATURE_BYTES = 64
+
+
+def _complete_prefix(buf):
+    """ 回傳 buf 中最後一筆完整紀錄的結尾位置 (避開仍在寫入中、或引號內換行的半筆資料) """
+    end = buf.rfind(b"\n")
+    while end >= 0:
+        if buf.count(b'"', 0, end) % 2 == 0:
+            return end + 1
+        end = buf.rfind(b"\n", 0, end)
+    return 0
+
+
+class VoteStore:
+    """ 投票 CSV 的增量讀取快取：記住上次讀到的位元組位置與檔案識別 (inode/大小/修改時間)，
+    每次刷新只解析新追加的列；檔案被改寫或刪除時才整份重新載入。
+    reader 決定如何解析 CSV (預設 pd.read_csv)，例如帶入明確型別以減少記憶體。 """
+
+    def __init__(self, path, reader=None):
+        self.path = path
+        self._reader = reader or pd.read_csv
+        self.version = 0
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._df = pd.DataFrame()
+        self._header = b""
+        self._offset = 0
+        self._ident = None
+        self._size = 0
+        self._mtime = None
+        self._signature = b""
+
+    def _read_range(self, f, start, end):
+        f.seek(start)
+        return f.read(end - start)
+
+    def _is_same_file(self, f, stat):
+        """ 確認檔案只是被追加：同一個 inode、沒有變短，且表頭與上次讀取位置前的內容都沒變 """
+        if (stat.st_dev, stat.st_ino) != self._ident or stat.st_size < self._offset:
+            return False
+        if self._read_range(f, 0, len(self._header)) != self._header:
+            return False
+        start = max(0, self._offset - SIGNATURE_BYTES)
+        return self._read_range(f, start, self._offset) == self._signature
+
+    def _remember(self, f, stat):
+        self._ident = (stat.st_dev, stat.st_ino)
+        self._size = stat.st_size
+        self._mtime = stat.st_mtime_ns
+        start = max(0, self._offset - SIGNATURE_BYTES)
+        self._signature = self._read_range(f, start, self._offset)
+
+    def _load_full(self, f):
+        f.seek(0)
+        data = f.read()
+        end = _complete_prefix(data)
+        header_end = data.find(b"\n") + 1
+        if end == 0 or header_end == 0:
+            return
+        self._header = data[:header_end]
+        with perf.timed("read_csv.full") as t:
+            self._df = self._reader(io.BytesIO(data[:end]))
+            t["rows"], t["bytes"] = len(self._df), end
+        self._offset = end
+        self.version += 1
+
+    def _load_tail(self, f):
+        f.seek(self._offset)
+        chunk = f.read()
+        end = _complete_prefix(chunk)
+        if end == 0:
+            return
+        with perf.timed("read_csv.tail") as t:
+            new_rows = self._reader(io.BytesIO(self._header + chunk[:end]))
+            t["rows"], t["bytes"] = len(new_rows), end
+        if self._df.empty:
+            self._df = new_rows
+        elif not new_rows.empty:
+            self._df = concat_columnar([self._df, new_rows])
+        self._offset += end
+        self.version += 1
+
+    def refresh(self):
+        """ 同步到檔案目前的內容並回傳完整的 DataFrame (呼叫端請勿就地修改) """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._ident is not None or not self._df.empty:
+                    self._reset()
+                    self.version += 1
+                    self.generation += 1
+                return self._df
+
+            if self._ident is not None and stat.st_size == self._size and stat.st_mtime_ns == self._mtime:
+                return self._df
+
+            with open(self.path, "rb") as f:
+                # 以已開啟的檔案為準，避免 stat 與 open 之間檔案剛好被替換
+                stat = os.fstat(f.fileno())
+                if self._ident is not None and not self._is_same_file(f, stat):
+                    self._reset()
+                    self.version += 1
+                    self.generation += 1
+                if self._offset == 0:
+                    self._load_full(f)
+                else:
+                    self._load_tail(f)
+                self._remember(f, stat)
+            return self._df
+
+    @property
+    def inode(self):
+        """ 上次讀取的檔案 inode；檔案不存在時為 None """
+        return self._ident[1] if self._ident is not None else None
+
+    def changes(self, cursor):
+        """ 回傳 cursor 之後新增的列、新的 cursor，以及檔案是否被改寫 (需從頭重建) """
+        df = self.refresh()
+        new_cursor = (self.generation, len(df))
+        if cursor is None or cursor[0] != self.generation or cursor[1] > len(df):
+            return df, new_cursor, True
+        return df.iloc[cursor[1]:], new_cursor, False